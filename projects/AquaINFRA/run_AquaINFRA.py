@@ -16,6 +16,9 @@ python projects/AquaINFRA/run_AquaINFRA.py --input 'projects/AquaINFRA/data/Rrs_
 # satellite as input
 python projects/AquaINFRA/run_AquaINFRA.py --input '/path/S3B_OL_2_WFR____20220703T075301_20220703T075601_20220704T171729_0179_067_363_2160_MAR_O_NT_003.SEN3.zip' --input_option 'sat' --sensor 'OLCI_S3A' --output '/path/to/save' --output_option 1
 
+# satellite as input with memberships of the two dominant types only
+python projects/AquaINFRA/run_AquaINFRA.py --input '/path/S3B_OL_2_WFR____20220703T075301_20220703T075601_20220704T171729_0179_067_363_2160_MAR_O_NT_003.SEN3.zip' --input_option 'sat' --sensor 'OLCI_S3A' --output '/path/to/save' --output_option 3
+
 Shun Bi, shun.bi@outlook.com
 01.11.2024
 '''
@@ -112,7 +115,9 @@ def find_file(directory, filename):
 
 def run_owt_sat(input_path_to_sat, input_sensor, output_path, output_option=1):
 
-    eumetsat = eumetsat_olci_level2(filename=input_path_to_sat, sensor=input_sensor, save_path=output_path, save=False)
+    # output_option 3 only keeps memberships of the two dominant types, not the full cube
+    top_k = 2 if output_option == 3 else None
+    eumetsat = eumetsat_olci_level2(filename=input_path_to_sat, sensor=input_sensor, save_path=output_path, save=False, top_k=top_k)
 
     if output_option == 1:
         eumetsat.save_result()
@@ -124,8 +129,21 @@ def run_owt_sat(input_path_to_sat, input_sensor, output_path, output_option=1):
                 {'Description': f'Membership values of optical water type {sel_type}'}
             )
         eumetsat.save_result()
+    elif output_option == 3:
+        for k in range(top_k):
+            eumetsat.ds_new[f'type_idx_top{k + 1}'] = (
+                ['rows', 'columns'],
+                eumetsat.owt.type_topk[:, :, k].astype(np.int32),
+                {'Description': f'Index value of the optical water type with the No. {k + 1} highest membership (-1: No data)'}
+            )
+            eumetsat.ds_new[f'U_top{k + 1}'] = (
+                ['rows', 'columns'],
+                eumetsat.owt.u_topk[:, :, k].astype(np.float32),
+                {'Description': f'Membership values of the optical water type with the No. {k + 1} highest membership'}
+            )
+        eumetsat.save_result()
     else:
-        raise ValueError('The output_option should be either 1 or 2')
+        raise ValueError('The output_option should be 1, 2, or 3')
 
 
 def main():
@@ -141,7 +159,7 @@ def main():
     parser.add_argument('--input_option', type=str, default='csv', required=True, help='Input option. "csv" for text data input; "sat" for satellite products input (e.g., Sentinel-3 OLCI Level-2)')
     parser.add_argument('--sensor', type=str, required=True, help=f'Name of you sensor. Select from {support_sensors}')
     parser.add_argument('--output', type=str, required=True, help='Path to your output file')
-    parser.add_argument('--output_option', type=int, required=True, default='1', help='Output option. 1: for standard output; 2: for extensive output with memberships of all types')
+    parser.add_argument('--output_option', type=int, required=True, default='1', help='Output option. 1: for standard output; 2: for extensive output with memberships of all types; 3: for memberships of the two dominant types (satellite input only)')
 
     args = parser.parse_args()
 
@@ -0,0 +1,60 @@
+'''
+Check and benchmark of the early distance cutoff in `OWT`: memberships of distances above
+`pyowt.OWT.DISTANCE_CUTOFF` are set to zero without evaluating the chi-square function.
+The results must be bit-identical to evaluating all distances.
+
+# run in terminal
+python projects/benchmarks/benchmark_distance_cutoff.py
+python projects/benchmarks/benchmark_distance_cutoff.py --rows 2000 --cols 2000
+'''
+
+import argparse
+import time
+import warnings
+
+import numpy as np
+
+from pyowt.OWT import OWT, DISTANCE_CUTOFF
+
+
+class OWTNoCutoff(OWT):
+    distance_cutoff = None
+
+
+def timed(cls, *args):
+    t0 = time.perf_counter()
+    owt = cls(*args)
+    return owt, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Check and benchmark of the OWT distance cutoff')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--cols', type=int, default=1000)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    # a scene with broad ranges of optical variables and some invalid pixels,
+    #   so that most type/pixel pairs are far away from the centroids
+    rng = np.random.default_rng(42)
+    shape = (args.rows, args.cols)
+    AVW = rng.uniform(400, 800, shape)
+    Area = np.exp(rng.normal(-1, 1.5, shape))
+    NDI = rng.uniform(-1, 1, shape)
+    AVW[:shape[0] // 10] = np.nan
+
+    owt_ref, t_ref = timed(OWTNoCutoff, AVW, Area, NDI)
+    owt_cut, t_cut = timed(OWT, AVW, Area, NDI)
+
+    far = np.mean(owt_ref.u == 0)
+    print(f"Scene: {shape[0]} x {shape[1]} pixels, cutoff d > {DISTANCE_CUTOFF:.6f}, {far:.1%} of u are 0")
+    print(f"  without cutoff: {t_ref:.3f} s")
+    print(f"  with cutoff   : {t_cut:.3f} s")
+
+    for name in ["u", "utot", "type_idx", "classifiability"]:
+        a, b = getattr(owt_ref, name), getattr(owt_cut, name)
+        identical = a.dtype == b.dtype and np.array_equal(a, b, equal_nan=a.dtype.kind == "f")
+        print(f"  {name:16s} bit-identical: {identical}")
+        assert identical, f"'{name}' differs with the distance cutoff"
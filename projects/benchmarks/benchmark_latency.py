@@ -0,0 +1,64 @@
+'''
+Latency benchmark of the stateless functional API (`pyowt.classify` and `pyowt.classify_rrs`)
+against the `OWT` class for small requests (1, 100, and 10k spectra), e.g., per request in
+the pygeoapi processors. The results of `pyowt.classify` must be the same as `OWT`.
+
+# run in terminal
+python projects/benchmarks/benchmark_latency.py
+python projects/benchmarks/benchmark_latency.py --sizes 1 10 100 1000 10000
+'''
+
+import argparse
+import os
+import timeit
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import pyowt
+from pyowt.OWT import OWT, load_centroids
+from pyowt.OpticalVariables import OpticalVariables
+
+
+def latency(func, n_spectra):
+    # best mean time per call (in microseconds) of a few repeats lasting ~0.2 s each
+    number = max(1, 20000 // n_spectra)
+    times = timeit.repeat(func, number=number, repeat=5)
+    return min(times) / number * 1e6
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Latency benchmark of pyowt.classify and pyowt.classify_rrs')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 10000])
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    # demo spectra (hyperspectral, 1 nm) repeated to the requested number
+    proj_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    d0 = pd.read_csv(os.path.join(proj_root, "data/Rrs_demo.csv"))
+    d = d0.pivot_table(index="SampleID", columns="wavelen", values="Rrs")
+    band = np.array(d.columns.tolist())
+    Rrs_demo = d.values
+
+    # centroids are loaded once per process, not part of the latency
+    load_centroids('v01')
+
+    print(f"{'spectra':>8s} {'OWT':>12s} {'classify':>12s} {'speedup':>8s} {'classify_rrs':>14s}")
+    for n in args.sizes:
+        Rrs = Rrs_demo[np.arange(n) % Rrs_demo.shape[0]]
+        ov = OpticalVariables(Rrs=Rrs, band=band)
+        AVW, Area, NDI = ov.AVW, ov.Area, ov.NDI  # (n, 1)
+
+        owt = OWT(AVW, Area, NDI)
+        res = pyowt.classify(AVW, Area, NDI)
+        for name in ["u", "utot", "type_idx", "classifiability"]:
+            assert np.array_equal(getattr(owt, name), getattr(res, name), equal_nan=True), \
+                f"'{name}' differs between OWT and pyowt.classify"
+
+        t_owt = latency(lambda: OWT(AVW, Area, NDI), n)
+        t_fun = latency(lambda: pyowt.classify(AVW, Area, NDI), n)
+        t_rrs = latency(lambda: pyowt.classify_rrs(Rrs, band), n)
+        print(f"{n:8d} {t_owt:10.1f}us {t_fun:10.1f}us {t_owt / t_fun:7.1f}x {t_rrs:12.1f}us")
@@ -0,0 +1,67 @@
+'''
+Accuracy and speed of the approximate OWT classification by lookup in a precomputed grid
+(`pyowt.LookupGrid.LookupGrid`) against the exact classification (`pyowt.classify`).
+The grid is built on the first run and cached in `PYOWT_CACHE_DIR` (default ~/.cache/pyowt).
+
+# run in terminal
+python projects/benchmarks/benchmark_lookup_grid.py
+python projects/benchmarks/benchmark_lookup_grid.py --resolution 101 81 101 --pixels 200000
+'''
+
+import argparse
+import time
+
+import numpy as np
+
+from pyowt.LookupGrid import LookupGrid
+from pyowt.OWT import OWT, classify, load_centroids
+
+
+def timed(func, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Accuracy and speed of the OWT lookup grid')
+    parser.add_argument('--version', type=str, default='v01')
+    parser.add_argument('--resolution', type=int, nargs=3, default=[201, 161, 201])
+    parser.add_argument('--pixels', type=int, default=1000000)
+    args = parser.parse_args()
+
+    grid, t_grid = timed(LookupGrid, version=args.version, resolution=args.resolution)
+    print(f"Grid {grid.resolution}, ABC range {grid.ABC_range}, {(grid.u.nbytes + grid.bound.nbytes) / 2**20:.0f} MB, "
+          f"loaded/built in {t_grid:.1f} s from {grid.path}")
+    print(f"  error of the samples: {grid.error}")
+
+    # samples from the distributions of all types, plus some outside of the grid and invalid ones
+    classInfo = load_centroids(args.version)
+    rng = np.random.default_rng(1)
+    n_type = args.pixels // classInfo.typeNumb
+    x = np.concatenate([rng.multivariate_normal(classInfo.mean_OWT[t], classInfo.covm_OWT[:, :, t], size=n_type)
+                        for t in range(classInfo.typeNumb)])
+    AVW, ABC, NDI = x.T
+    Area = OWT.trans_boxcox_rev(np.maximum(ABC, -1 / classInfo.lamBC + 1e-6), classInfo.lamBC)
+    AVW[::1000] = 850
+    NDI[1::1000] = np.nan
+
+    exact, t_exact = timed(classify, AVW, Area, NDI, version=args.version)
+    inside = grid._inside(AVW, exact.ABC, NDI)
+    base, _ = grid._cells(AVW[inside], exact.ABC[inside], NDI[inside])
+
+    print(f"{'tol':>8s} {'time':>8s} {'max|du|':>8s} {'max|dutot|':>10s} {'same type':>10s} {'from grid':>10s}")
+    print(f"{'exact':>8s} {t_exact:7.2f}s")
+    for tol in [0.001, 0.002, 0.005, 0.01]:
+        approx, t_approx = timed(grid.classify, AVW, Area, NDI, tol=tol)
+        du = np.nanmax(np.abs(approx.u - exact.u))
+        dutot = np.nanmax(np.abs(approx.utot - exact.utot))
+        same = np.mean(approx.type_idx == exact.type_idx)
+        from_grid = np.sum(grid.bound[base] <= tol) / AVW.size
+        print(f"{tol:8.3f} {t_approx:7.2f}s {du:8.5f} {dutot:10.5f} {same:10.4%} {from_grid:10.2%}")
+
+        # the error is bounded by `tol`, and pixels outside of the grid are classified exactly
+        assert du <= tol and dutot <= tol, tol
+        for name in ['u', 'utot', 'type_idx', 'classifiability']:
+            assert np.array_equal(getattr(approx, name)[~inside], getattr(exact, name)[~inside], equal_nan=True), name
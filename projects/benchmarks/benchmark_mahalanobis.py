@@ -0,0 +1,97 @@
+'''
+Benchmark of the Mahalanobis distance step of `OWT`: the previous per-type loop 
+(stacked feature cube + one einsum per type) against the fused all-types kernel 
+`pyowt.OWT.mahalanobis_distance`.
+
+The distances alone are an (N, 10) output, which bounds the memory reduction of the 
+kernel (~1.8x). So the membership step is compared as well: the previous loop keeps the 
+full distance cube before the memberships, while `pyowt.OWT.classify_into` writes the 
+memberships block by block into `u` and never holds the distances of all pixels.
+
+# run in terminal (default is a 1000 x 1000 scene; 4865 x 4091 is a full resolution OLCI scene)
+python projects/benchmarks/benchmark_mahalanobis.py
+python projects/benchmarks/benchmark_mahalanobis.py --rows 4865 --cols 4091
+'''
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from scipy.stats import chi2
+
+from pyowt.OWT import OWT, classify_into, load_centroids, mahalanobis_distance
+
+
+def distance_loop(AVW, ABC, NDI, classInfo):
+    # the implementation of `OWT.run_classification` up to pyowt 0.66
+    x = np.array([AVW, ABC, NDI]).transpose(1, 2, 0)
+    d = np.zeros((x.shape[0], x.shape[1], classInfo.typeNumb))
+    for i in range(classInfo.typeNumb):
+        y = classInfo.mean_OWT[i, :][None, None, :]
+        covm_inv = np.linalg.inv(classInfo.covm_OWT[:, :, i])
+        diff = x - y
+        d[:, :, i] = np.einsum("...i,ij,...j->...", diff, covm_inv, diff)
+    return d
+
+
+def memberships_loop(AVW, Area, NDI, classInfo):
+    # memberships of `OWT.run_classification` up to pyowt 0.66, from the full distance cube
+    ABC = OWT.trans_boxcox(Area, classInfo.lamBC)
+    d = distance_loop(AVW, ABC, NDI, classInfo)
+    u = np.round(1 - chi2.cdf(d, df=3), 6)
+    return u, np.sum(u, axis=-1)
+
+
+def memberships_blocked(AVW, Area, NDI, version):
+    result = classify_into(AVW, Area, NDI, version=version, outputs=['u', 'utot'])
+    return result.u, result.utot
+
+
+def profile(func, *args):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024**2
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark of the Mahalanobis distance kernels')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--cols', type=int, default=1000)
+    parser.add_argument('--version', type=str, default='v01')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    shape = (args.rows, args.cols)
+    AVW = rng.uniform(420, 720, shape)
+    Area = np.exp(rng.normal(-1, 1.5, shape))
+    NDI = rng.uniform(-1, 1, shape)
+
+    classInfo = load_centroids(args.version)
+    ABC = OWT.trans_boxcox(Area, classInfo.lamBC)
+
+    d_loop, t_loop, m_loop = profile(distance_loop, AVW, ABC, NDI, classInfo)
+    d_fused, t_fused, m_fused = profile(mahalanobis_distance, AVW, ABC, NDI, classInfo)
+
+    print(f"Scene: {shape[0]} x {shape[1]} pixels, centroids {args.version}")
+    print("Distances:")
+    print(f"  per-type loop: {t_loop:8.3f} s, peak {m_loop:9.1f} MiB")
+    print(f"  fused kernel : {t_fused:8.3f} s, peak {m_fused:9.1f} MiB")
+    print(f"  speed-up {t_loop / t_fused:.1f}x, memory reduction {m_loop / m_fused:.1f}x")
+    print(f"  max relative difference: {np.max(np.abs(d_fused - d_loop) / d_loop):.2e}")
+    del d_loop, d_fused
+
+    (u_loop, _), t_loop, m_loop = profile(memberships_loop, AVW, Area, NDI, classInfo)
+    (u_blocked, _), t_blocked, m_blocked = profile(memberships_blocked, AVW, Area, NDI, args.version)
+
+    print("Memberships (u and utot):")
+    print(f"  per-type loop: {t_loop:8.3f} s, peak {m_loop:9.1f} MiB")
+    print(f"  blocks into u: {t_blocked:8.3f} s, peak {m_blocked:9.1f} MiB")
+    print(f"  speed-up {t_loop / t_blocked:.1f}x, memory reduction {m_loop / m_blocked:.1f}x")
+    print(f"  max absolute difference: {np.nanmax(np.abs(u_blocked - u_loop)):.2e}")
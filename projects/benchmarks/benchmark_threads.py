@@ -0,0 +1,71 @@
+'''
+Scaling of `pyowt.classify_rrs` and `pyowt.OWT.classify_into` with the number of threads (`n_workers`),
+and of `pyowt.classify_rrs(..., backend='process')` with the number of processes. The results must be 
+identical to those of a single thread. Use `--step` to take every n-th band of the demo spectra, 
+which are then taken as hyperspectral Rrs not at 1 nm (AVW by precomputed interpolation weights).
+
+# run in terminal
+python projects/benchmarks/benchmark_threads.py
+python projects/benchmarks/benchmark_threads.py --pixels 4000000 --workers 1 2 4 8 16 32
+python projects/benchmarks/benchmark_threads.py --step 5
+'''
+
+import argparse
+import os
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import pyowt
+from pyowt.OWT import classify_into
+
+
+def timed(func, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def assert_same(a, b):
+    for name, arr in vars(a).items():
+        assert np.array_equal(arr, getattr(b, name), equal_nan=True), f"'{name}' differs from one thread"
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Scaling of the OWT classification with n_workers')
+    parser.add_argument('--pixels', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--step', type=int, default=1)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", DeprecationWarning)
+    print(f"{os.cpu_count()} CPUs")
+
+    # demo spectra (hyperspectral, 1 nm) repeated to the requested number, as an image
+    proj_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    d0 = pd.read_csv(os.path.join(proj_root, "data/Rrs_demo.csv"))
+    d = d0.pivot_table(index="SampleID", columns="wavelen", values="Rrs")
+    band = np.array(d.columns.tolist())[::args.step]
+    n_rows = max(1, args.pixels // 1000)
+    Rrs = d.values[np.arange(n_rows * 1000) % d.shape[0]].reshape(n_rows, 1000, -1)[..., ::args.step]
+
+    ref_rrs, _ = timed(pyowt.classify_rrs, Rrs, band)
+    AVW, Area, NDI = ref_rrs.AVW, ref_rrs.Area, ref_rrs.NDI
+    ref_owt, _ = timed(classify_into, AVW, Area, NDI)
+
+    print(f"{'n_workers':>9s} {'classify_into':>14s} {'speedup':>8s} {'classify_rrs':>13s} {'speedup':>8s} "
+          f"{'(process)':>10s} {'speedup':>8s}")
+    t_owt_1 = t_rrs_1 = None
+    for n_workers in args.workers:
+        res_owt, t_owt = timed(classify_into, AVW, Area, NDI, n_workers=n_workers)
+        res_rrs, t_rrs = timed(pyowt.classify_rrs, Rrs, band, n_workers=n_workers)
+        res_proc, t_proc = timed(pyowt.classify_rrs, Rrs, band, n_workers=n_workers, backend='process')
+        assert_same(res_owt, ref_owt)
+        assert_same(res_rrs, ref_rrs)
+        assert_same(res_proc, ref_rrs)
+        t_owt_1, t_rrs_1 = t_owt_1 or t_owt, t_rrs_1 or t_rrs
+        print(f"{n_workers:9d} {t_owt:13.2f}s {t_owt_1 / t_owt:7.1f}x {t_rrs:12.2f}s {t_rrs_1 / t_rrs:7.1f}x "
+              f"{t_proc:9.2f}s {t_rrs_1 / t_proc:7.1f}x")
@@ -0,0 +1,44 @@
+'''
+Check that the classification of the unique (AVW, Area, NDI) triples only (`dedup=True` of
+`pyowt.OWT.classify_into` and `OWT`) gives the same results as the classification of all pixels,
+also for pixels with NaN inputs that are passed as valid (e.g., by `OpticalVariables.valid`).
+
+# run in terminal
+python projects/benchmarks/check_dedup.py
+'''
+
+import numpy as np
+
+from pyowt.OWT import classify_into
+
+
+OUTPUTS = ['ABC', 'u', 'utot', 'type_idx', 'classifiability']
+
+
+def check(name, AVW, Area, NDI, **kwargs):
+    full = classify_into(AVW, Area, NDI, **kwargs)
+    dedup = classify_into(AVW, Area, NDI, dedup=True, **kwargs)
+    same = all(np.array_equal(getattr(full, k), getattr(dedup, k), equal_nan=True) for k in OUTPUTS)
+    print(f"{name:>28s}: {'same' if same else 'DIFFERENT'}, compression ratio {dedup.meta['compression_ratio']:.1f}")
+    assert same, name
+
+
+if __name__ == "__main__":
+
+    # a valid pixel and a NaN pixel which share AVW and NDI
+    AVW, Area, NDI = np.array([[500., 500, 600]]), np.array([[1., 2, np.nan]]), np.array([[.1, .1, .1]])
+    check("NaN Area passed as valid", AVW, Area, NDI, valid=np.ones(AVW.shape, dtype=bool))
+
+    # a scene of repeated triples, with NaN, zero, and infinite inputs
+    rng = np.random.default_rng(0)
+    pool = np.column_stack([rng.uniform(400, 800, 500), np.exp(rng.normal(-1, 1.5, 500)), rng.uniform(-1, 1, 500)])
+    pool[:20, 0] = np.nan
+    pool[20:40, 1] = np.nan
+    pool[40:50, 1] = 0
+    pool[50:60, 1] = np.inf
+    pool[60:80, 2] = np.nan
+    AVW, Area, NDI = pool[rng.integers(0, len(pool), (300, 400))].transpose(2, 0, 1)
+
+    check("scene", AVW, Area, NDI)
+    check("scene, skip_invalid", AVW, Area, NDI, skip_invalid=True)
+    check("scene, all passed as valid", AVW, Area, NDI, valid=np.ones(AVW.shape, dtype=bool))
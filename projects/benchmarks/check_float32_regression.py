@@ -0,0 +1,74 @@
+'''
+Regression check of the float32 path of `OpticalVariables` and `OWT` against float64 
+on the training data set of Bi and Hieronymi (2024), https://zenodo.org/records/12803329.
+The disagreement rate of `type_idx` should stay below the tolerance (0.1% by default).
+
+The nc file can be prepared by the scripts in `projects/zenodo`. Without it, the check runs
+on the demo spectra in `data/Rrs_demo.csv` instead and exits with status 77 (skipped), so the 
+type agreement is always asserted but a missing training data set isn't taken as a pass.
+
+# run in terminal
+python projects/benchmarks/check_float32_regression.py
+python projects/benchmarks/check_float32_regression.py --version v02 --tolerance 0.0005
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from pyowt.Pipeline import classify_rrs
+
+
+# exit status when the training data is missing and only the demo spectra are checked
+EXIT_SKIPPED = 77
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Regression check of float32 against float64 classification')
+    parser.add_argument('--input', type=str, default='projects/zenodo/owt_BH2024_training_data_hyper.nc')
+    parser.add_argument('--version', type=str, default='v01')
+    parser.add_argument('--tolerance', type=float, default=0.001, help='Maximum disagreement rate of type_idx')
+    args = parser.parse_args()
+
+    skipped = not os.path.exists(args.input)
+    if skipped:
+        print(f"File {args.input} doesn't exist, please prepare it via the scripts in projects/zenodo.")
+        print("Checking the demo spectra instead.")
+        proj_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        d0 = pd.read_csv(os.path.join(proj_root, "data/Rrs_demo.csv"))
+        d = d0.pivot_table(index="SampleID", columns="wavelen", values="Rrs")
+        wavelen = np.array(d.columns.tolist())
+        Rrs = d.values
+    else:
+        ds = xr.open_dataset(args.input)
+        wavelen = ds['wavelen'].values
+        Rrs = ds['Rrs'].values
+
+    t0 = time.perf_counter()
+    res64 = classify_rrs(Rrs, wavelen, version=args.version)
+    t1 = time.perf_counter()
+    res32 = classify_rrs(Rrs.astype(np.float32), wavelen, version=args.version, dtype=np.float32)
+    t2 = time.perf_counter()
+
+    disagree = res64.type_idx != res32.type_idx
+    rate = np.mean(disagree)
+
+    print(f"{'Demo' if skipped else 'Training'} data: {Rrs.shape[0]} spectra, centroids {args.version}")
+    print(f"  float64: {t1 - t0:.2f} s, float32: {t2 - t1:.2f} s")
+    for name in ['AVW', 'Area', 'NDI', 'u', 'utot']:
+        diff = np.abs(getattr(res64, name) - getattr(res32, name).astype(np.float64))
+        print(f"  max |{name} (float64) - {name} (float32)|: {np.nanmax(diff):.3e}")
+    print(f"  type_idx disagreement: {np.sum(disagree)} spectra ({rate:.4%})")
+    print(f"  classifiability disagreement: {np.sum(res64.classifiability != res32.classifiability)} spectra")
+
+    assert rate <= args.tolerance, f"type_idx disagreement rate {rate:.4%} exceeds {args.tolerance:.4%}"
+
+    if skipped:
+        print(f"Training data missing: exit with status {EXIT_SKIPPED} (skipped)")
+        sys.exit(EXIT_SKIPPED)
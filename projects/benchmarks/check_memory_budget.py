@@ -0,0 +1,76 @@
+'''
+Check of the memory estimate (`pyowt.Pipeline.estimate_memory`) and the memory budget (`max_memory`)
+of `pyowt.classify_rrs`: the peak memory (traced by tracemalloc, which NumPy reports to) of runs with
+budgets of 50% and 20% of the working set must stay below the budget, with the same results as
+without a budget.
+
+# run in terminal
+python projects/benchmarks/check_memory_budget.py
+python projects/benchmarks/check_memory_budget.py --pixels 200000
+'''
+
+import argparse
+import os
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import pyowt
+from pyowt.Pipeline import estimate_memory
+
+
+def traced_peak(func, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Check of the memory budget of classify_rrs')
+    parser.add_argument('--pixels', type=int, default=60000)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    proj_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    d0 = pd.read_csv(os.path.join(proj_root, "data/Rrs_demo.csv"))
+    d = d0.pivot_table(index="SampleID", columns="wavelen", values="Rrs")
+    band = np.array(d.columns.tolist())  # 350-900 nm by 2 nm
+    n_rows = max(1, args.pixels // 300)
+    hyper = d.values[np.arange(n_rows * 300) % d.shape[0]].reshape(n_rows, 300, -1)
+    band_1nm = np.arange(400, 801)
+    hyper_1nm = np.stack([np.interp(band_1nm, band, r) for r in d.values])[np.arange(n_rows * 300) % d.shape[0]]
+    olci = np.array([400, 412.5, 442.5, 490, 510, 560, 620, 665, 673.75, 681.25, 708.75, 753.75, 761.25,
+                     764.375, 767.5, 778.75, 865, 885, 900, 940, 1020])
+
+    cases = {
+        'hyper 2 nm': (hyper, band, None),
+        'hyper 1 nm': (hyper_1nm.reshape(n_rows, 300, -1), band_1nm, None),
+        'olci-s3a': (np.random.default_rng(0).uniform(0.001, 0.02, (n_rows, 300, olci.size)), olci, 'olci-s3a'),
+    }
+
+    print(f"{'case':>12s} {'dtype':>8s} {'estimate':>9s} {'peak':>8s} | budget / peak (MB)")
+    for case, (Rrs, band_, sensor) in cases.items():
+        Rrs = Rrs.copy()
+        Rrs[:n_rows // 10] = np.nan
+        for dtype in [None, np.float32]:
+            ref, peak = traced_peak(pyowt.classify_rrs, Rrs, band_, sensor, dtype=dtype)
+            est = estimate_memory(Rrs, band_, sensor, dtype=dtype)
+            line = f"{case:>12s} {np.dtype(dtype).name if dtype else 'None':>8s} " \
+                   f"{est['peak_bytes'] / 2**20:8.1f}M {peak / 2**20:7.1f}M |"
+
+            for frac in [0.5, 0.2]:
+                budget = int(est['fixed_bytes'] + frac * (est['peak_bytes'] - est['fixed_bytes']))
+                res, peak = traced_peak(pyowt.classify_rrs, Rrs, band_, sensor, dtype=dtype, max_memory=budget)
+                for name in vars(ref):
+                    assert np.array_equal(getattr(ref, name), getattr(res, name), equal_nan=True), \
+                        f"'{name}' differs with max_memory"
+                assert peak <= budget, f"peak {peak} above the budget {budget}"
+                line += f" {budget / 2**20:6.1f} / {peak / 2**20:6.1f}"
+            print(line)
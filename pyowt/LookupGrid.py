@@ -0,0 +1,294 @@
+import numpy as np
+import hashlib
+import os
+import tempfile
+from types import SimpleNamespace
+
+from scipy.ndimage import maximum_filter
+
+from pyowt.OWT import (BLOCK_SIZE, DISTANCE_CUTOFF, classify, load_centroids, mahalanobis_distance,
+                       membership_from_distance, _boxcox_into, _classify_blocks, _mask_rows, _types_from_memberships)
+
+
+def default_cache_dir():
+    """Folder of cached lookup grids, `PYOWT_CACHE_DIR` if set, otherwise ~/.cache/pyowt
+    """
+    return os.environ.get('PYOWT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'pyowt'))
+
+
+class LookupGrid():
+
+    # grid ranges of AVW and NDI; pixels outside of the grid are classified exactly
+    AVW_range = (400, 800)
+    NDI_range = (-1, 1)
+
+    # largest error of the memberships (u) and utot from the grid; pixels of cells with a larger
+    #   error bound are classified exactly
+    tol = 0.001
+
+    # safety factor of the error bound of the cells over the estimate from the second differences
+    bound_factor = 2
+
+    # number of random samples per type (and uniform over the grid) to check the error of the lookup
+    n_error_samples = 20000
+
+    def __init__(self, version='v01', resolution=(201, 161, 201), ABC_range=None, cache_dir=None):
+        """Approximate OWT classification by trilinear interpolation in a grid of precomputed memberships
+
+        The classification only depends on AVW, ABC (the Box-Cox transformed Area), and NDI,
+        so the memberships (u) can be precomputed on a regular grid over these three variables
+        and interpolated between the eight nodes of the grid cell of a pixel, which saves the
+        distance and chi-square calculations. utot, type_idx, and classifiability follow from
+        the interpolated u as in `pyowt.classify`.
+
+        The error of u and utot is bounded by `tol` (0.001 by default). The interpolation error
+        of a cell is at most 1/8 of the sum of the second derivatives along the three axes (times
+        the squared steps), which is estimated from the largest second differences of the nodes
+        around the cell, with a safety factor of 2, plus the rounding of u to float16 (2**-12 of u).
+        Pixels in cells with a larger bound are classified exactly, and so are pixels in cells
+        whose corners have different types, pixels whose utot is within the bound of `thres_u`,
+        and pixels outside of the grid. The errors of random samples from the distributions of
+        all types and from the whole grid are checked when building the grid and kept in `error`,
+        along with the fraction of samples taken from the grid.
+
+        The grid takes 22 bytes per node (float16 u of 10 types and a float16 bound per cell),
+        ~140 MB for the default resolution (2 nm for AVW, ~0.11 for ABC, and 0.01 for NDI), and
+        is built in ~15 s. It is cached on disk as an .npz file per version, resolution, and range
+        in `cache_dir`, so that it is only built once per user.
+
+        The lookup isn't faster than the exact classification (`pyowt.classify`): interpolating
+        u of a pixel from the eight corners takes about as long as its exact classification
+        (~0.6 us on one CPU), and u is too steep at the default resolution (the narrow NDI
+        distributions of types 1 and 2) for most cells to be within `tol`: ~0.5% of the samples
+        of all types are taken from the grid for 0.001, and ~30% for 0.01. See the error and
+        speed in `projects/benchmarks/benchmark_lookup_grid.py`.
+
+        Args:
+            version (str): Version of the classification centroids. Default as 'v01'.
+            resolution (tuple): number of grid nodes for AVW, ABC, and NDI. Default as (201, 161, 201).
+            ABC_range (tuple, optional): range of ABC on the grid. Default as None, that is
+                from 6 standard deviations below to above the type means.
+            cache_dir (str, optional): folder of cached grids, False to not cache. Default as
+                `default_cache_dir()`.
+
+        Examples:
+
+            grid = LookupGrid(version='v01')
+            res = grid.classify(ov.AVW, ov.Area, ov.NDI)
+            print(grid.error)
+        """
+        self.version = version
+        self.classInfo = load_centroids(version)
+        self.resolution = tuple(int(n) for n in resolution)
+
+        if len(self.resolution) != 3 or min(self.resolution) < 3:
+            raise ValueError(f"`resolution` should be three numbers of grid nodes (>= 3), got {resolution}")
+
+        if ABC_range is None:
+            sd = np.sqrt(self.classInfo.covm_OWT[1, 1, :])
+            ABC_mean = self.classInfo.mean_OWT[:, 1]
+            ABC_range = (np.floor(np.min(ABC_mean - 6 * sd)), np.ceil(np.max(ABC_mean + 6 * sd)))
+        self.ABC_range = tuple(float(v) for v in ABC_range)
+
+        self.ranges = (self.AVW_range, self.ABC_range, self.NDI_range)
+        self.axes = tuple(np.linspace(lo, hi, n) for (lo, hi), n in zip(self.ranges, self.resolution))
+        self.steps = tuple(ax[1] - ax[0] for ax in self.axes)
+
+        # the eight corners of a cell by their sides (0 or 1) per axis, and their flat offsets from its first node
+        nA, nB, nN = self.resolution
+        self._corners = np.array([(a, b, c) for a in (0, 1) for b in (0, 1) for c in (0, 1)], dtype=bool)
+        self._offsets = self._corners @ np.array([nB * nN, nN, 1])
+
+        self.cache_dir = default_cache_dir() if cache_dir is None else cache_dir
+        self.path = os.path.join(self.cache_dir, self._cache_name()) if self.cache_dir else None
+
+        if self.path is not None and os.path.isfile(self.path):
+            with np.load(self.path) as data:
+                self.u, self.bound = data['u'], data['bound']
+                self.error = {key[len('error_'):]: float(data[key]) for key in data.files if key.startswith('error_')}
+        else:
+            self.u, self.bound = self._build()
+            self.error = self._estimate_error()
+            if self.path is not None:
+                self._save()
+
+    def _cache_name(self):
+        # the grid depends on the centroids, the resolution, the ranges, and the bound
+        key = hashlib.sha1()
+        for arr in [self.classInfo.mean_OWT, self.classInfo.covm_OWT]:
+            key.update(np.ascontiguousarray(arr).tobytes())
+        key.update(repr((self.classInfo.lamBC, self.resolution, self.ranges, self.bound_factor)).encode())
+        nA, nB, nN = self.resolution
+        return f"owt_lookup_{self.version}_{nA}x{nB}x{nN}_{key.hexdigest()[:12]}.npz"
+
+    def _build(self):
+        # exact u on the grid nodes (flattened), one AVW slice at a time, and the error bound per cell
+        ABC, NDI = np.meshgrid(self.axes[1], self.axes[2], indexing='ij')
+        m = ABC.size
+        typeNumb = self.classInfo.typeNumb
+        u = np.empty(self.resolution + (typeNumb,), dtype=np.float16)
+        type_idx = np.empty(self.resolution, dtype=np.int8)
+        blk = {"u": np.empty((m, typeNumb)), "utot": np.empty(m),
+               "type_idx": np.empty(m, dtype=np.int8), "classifiability": np.empty(m, dtype=np.int_)}
+        for i, AVW in enumerate(self.axes[0]):
+            mahalanobis_distance(np.full(m, AVW), ABC.reshape(-1), NDI.reshape(-1), self.classInfo, out=blk["u"])
+            membership_from_distance(blk["u"], out=blk["u"])
+            _types_from_memberships(blk, 0, None)
+            u[i] = blk["u"].reshape(u.shape[1:])
+            type_idx[i] = blk["type_idx"].reshape(type_idx.shape[1:])
+
+        # (the largest value over the eight corners of each cell, kept at its first node)
+        def cell_max(x):
+            return maximum_filter(x, size=2, origin=-1, mode='nearest')
+
+        def interpolation_error(x):
+            # 1/8 of the sum of the largest second differences along each axis around the cell
+            err = np.zeros(x.shape, dtype=np.float32)
+            for axis in range(3):
+                d2 = np.zeros(x.shape, dtype=np.float32)
+                inner = [slice(None)] * 3
+                inner[axis] = slice(1, -1)
+                d2[tuple(inner)] = np.abs(np.diff(x, n=2, axis=axis))
+                err += cell_max(maximum_filter(d2, size=3, mode='nearest'))
+            return err / 8
+
+        utot = u.sum(axis=-1, dtype=np.float32)
+        bound = interpolation_error(utot)
+        for t in range(typeNumb):
+            np.maximum(bound, interpolation_error(u[..., t].astype(np.float32)), out=bound)
+        bound *= self.bound_factor
+        bound += 2.0 ** -11 * cell_max(utot)
+        bound[cell_max(type_idx) != -cell_max(-type_idx)] = 1
+
+        return u.reshape(-1, typeNumb), np.minimum(bound, 1).astype(np.float16).reshape(-1)
+
+    def _estimate_error(self):
+        # lookup error of random samples from the type distributions and from the whole grid
+        rng = np.random.default_rng(0)
+        x = np.concatenate([rng.multivariate_normal(self.classInfo.mean_OWT[t], self.classInfo.covm_OWT[:, :, t],
+                                                    size=self.n_error_samples)
+                            for t in range(self.classInfo.typeNumb)] +
+                           [rng.uniform(*zip(*self.ranges), size=(self.n_error_samples, 3))])
+        # (ABC below -1 / lambda has no Area)
+        x = x[self._inside(*x.T) & (x[:, 1] * self.classInfo.lamBC + 1 > 0)]
+        Area = (x[:, 1] * self.classInfo.lamBC + 1) ** (1 / self.classInfo.lamBC)
+
+        approx = self.classify(x[:, 0], Area, x[:, 2])
+        exact = classify(x[:, 0], Area, x[:, 2], version=self.version)
+        base, _ = self._cells(*x.T)
+        return {'max_abs_u': float(np.max(np.abs(approx.u - exact.u))),
+                'max_abs_utot': float(np.max(np.abs(approx.utot - exact.utot))),
+                'type_agreement': float(np.mean(approx.type_idx == exact.type_idx)),
+                'lookup_fraction': float(np.mean(self.bound[base] <= self.tol))}
+
+    def _save(self):
+        # written to a temporary file first, so that other processes never see a partial grid
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix='.npz', dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, u=self.u, bound=self.bound, **{f'error_{key}': value for key, value in self.error.items()})
+            os.replace(tmp, self.path)
+        except OSError as e:
+            import warnings
+            warnings.warn(f"The lookup grid couldn't be cached in {self.cache_dir}: {e}", UserWarning, stacklevel=3)
+
+    def _inside(self, AVW, ABC, NDI):
+        # pixels inside the grid (False for NaN)
+        inside = np.ones(np.shape(AVW), dtype=bool)
+        for x, (lo, hi) in zip((AVW, ABC, NDI), self.ranges):
+            inside &= (x >= lo) & (x <= hi)
+        return inside
+
+    def _cells(self, AVW, ABC, NDI):
+        # flat index of the first node of the cell of pixels inside the grid, and their position
+        #   in the cell (0 to 1) per axis
+        base = np.zeros(np.shape(AVW), dtype=np.intp)
+        frac = np.empty(np.shape(AVW) + (3,))
+        for j, (x, ax, step, n) in enumerate(zip((AVW, ABC, NDI), self.axes, self.steps, self.resolution)):
+            pos = (x - ax[0]) / step
+            i0 = np.minimum(pos.astype(np.intp), n - 2)
+            frac[..., j] = pos - i0
+            base *= n
+            base += i0
+        return base, frac
+
+    def classify(self, AVW, Area, NDI, thres_u=0.0001, dtype=np.float64, tol=None):
+        """Classify by trilinear interpolation in the grid, as `pyowt.classify`
+
+        Pixels outside of the grid (e.g., AVW > 800, extreme Area, or NaN) or in cells with an error
+        bound above `tol` are classified exactly, see `LookupGrid`.
+
+        Args:
+            AVW, Area, NDI (array_like): optical variables of the same shape (or scalars)
+            thres_u (numeric): the threshold of membership (u) to mask out non-classifiable inputs.
+            dtype (np.dtype): floating type of the outputs u, utot, and ABC. Default as np.float64.
+            tol (float, optional): largest error of u and utot from the grid. Default as `LookupGrid.tol`.
+
+        Returns:
+            SimpleNamespace: ABC, u, utot, type_idx, and classifiability in the shape of the inputs
+                (u with an extra last dim for types), see `pyowt.classify`
+        """
+        tol = self.tol if tol is None else tol
+        AVW, Area, NDI = [np.asarray(x, dtype=np.float64) for x in (AVW, Area, NDI)]
+
+        if not (AVW.shape == Area.shape == NDI.shape):
+            raise ValueError("The shapes of AVW, Area, and NDI must be the same!")
+
+        shape = AVW.shape
+        work_shape = shape + (1,) * max(0, 2 - len(shape))
+        n = AVW.size
+        typeNumb = self.classInfo.typeNumb
+        AVW_, Area_, NDI_ = AVW.reshape(-1), Area.reshape(-1), NDI.reshape(-1)
+
+        ABC = np.empty(n)
+        _boxcox_into(Area_, ABC, self.classInfo.lamBC)
+
+        result = {
+            "ABC": ABC.astype(dtype, copy=False),
+            "u": np.empty((n, typeNumb), dtype=dtype),
+            "utot": np.empty(n, dtype=dtype),
+            "type_idx": np.empty(n, dtype=np.int8),
+            "classifiability": np.empty(n, dtype=np.int_),
+        }
+        exact = np.ones(n, dtype=bool)
+
+        # the pixels inside the grid in cells with a bound within `tol`, by blocks
+        inside = np.flatnonzero(self._inside(AVW_, ABC, NDI_))
+        for start in range(0, inside.size, BLOCK_SIZE):
+            pixels = inside[start:start + BLOCK_SIZE]
+            base, frac = self._cells(AVW_[pixels], ABC[pixels], NDI_[pixels])
+            bound = self.bound[base]
+            lookup = bound <= tol
+            pixels, base, frac, bound = pixels[lookup], base[lookup], frac[lookup], bound[lookup]
+
+            # u as the sum of the corners weighted by the products of their sides (as ordered in `_corners`)
+            sides = np.stack([1 - frac, frac], axis=-1).astype(np.float32)
+            weights = (sides[:, 0, :, None, None] * sides[:, 1, None, :, None] * sides[:, 2, None, None, :])
+            corners = self.u[base[:, None] + self._offsets].astype(np.float32)
+            u = np.matmul(weights.reshape(-1, 1, 8), corners)[:, 0]
+            utot = u.sum(axis=-1)
+
+            # classifiability is only taken from the grid away from the threshold
+            lookup = np.abs(utot - thres_u) > bound
+            pixels, u, utot = pixels[lookup], u[lookup], utot[lookup]
+
+            # as `_types_from_memberships`
+            type_idx = np.argmax(u, axis=-1).astype(np.int8)
+            type_idx[np.max(u, axis=-1) <= 0] = -1
+            result["u"][pixels] = u
+            result["utot"][pixels] = utot
+            result["type_idx"][pixels] = type_idx
+            result["classifiability"][pixels] = (utot >= thres_u) & (type_idx != -1)
+            exact[pixels] = False
+
+        if np.any(exact):
+            _classify_blocks((AVW_, Area_, NDI_), [{**result, "ABC": None}], [self.classInfo], thres_u,
+                             DISTANCE_CUTOFF, BLOCK_SIZE, index=np.flatnonzero(exact))
+
+        # as `OWT.update_type_idx`, which checks utot <= thres_u along the last axis
+        _mask_rows({name: result[name].reshape(work_shape) for name in ("utot", "type_idx", "classifiability")},
+                   thres_u)
+
+        return SimpleNamespace(**{name: arr.reshape(shape + arr.shape[1:]) for name, arr in result.items()})
+
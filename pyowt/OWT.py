@@ -1,28 +1,889 @@
 import numpy as np
 import xarray as xr
+from collections import namedtuple
 from types import SimpleNamespace
-from scipy.stats import chi2
+from scipy.special import erfc
+from pandas import factorize
 
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Read-only record of one centroid set, shared by all `OWT` instances of the same version.
+#   mean_OWT[i, :] is the 1x3 mean of the i-th OWT
+#   covm_OWT[:, :, i], covm_inv_OWT[:, :, i] are its 3x3 covariance matrix and inverse
+#   chol_inv_OWT[:, :, i] is the inverse of its lower Cholesky factor L (covm = L @ L.T),
+#       so that the Mahalanobis distance is sum((chol_inv @ (x - mean))**2)
+#   whiten_A (3, 3 * typeNumb) and whiten_b (3 * typeNumb,) whiten x for all types at once,
+#       z = x @ whiten_A - whiten_b, see `mahalanobis_distance`
+CentroidSet = namedtuple(
+    "CentroidSet",
+    [
+        "version",
+        "mean_OWT",
+        "covm_OWT",
+        "covm_inv_OWT",
+        "chol_inv_OWT",
+        "whiten_A",
+        "whiten_b",
+        "lamBC",
+        "typeName",
+        "typeNumb",
+        "typeColName",
+        "typeColHex",
+    ],
+)
+
+# process-wide cache of loaded centroid sets, keyed by version
+_CENTROIDS_CACHE = {}
+_CENTROIDS_LOCK = threading.Lock()
+
+
+def _read_only(arr):
+    arr = np.array(arr, dtype=np.float64)
+    arr.setflags(write=False)
+    return arr
+
+
+def load_centroids(version='v01'):
+    """Load the centroids of `version`, reading `data/{version}/OWT_centroids.nc` once per process
+
+    The returned `CentroidSet` is cached and shared by all callers. Its arrays are 
+    read-only and its name/color lists are tuples, so it can't be modified in place;
+    make a copy (e.g., `list(classInfo.typeName)`) if you need to edit them.
+
+    Args:
+        version (str): Version of the classification centroids, e.g., 'v01' or 'v02'
+
+    Returns:
+        CentroidSet: means, covariance matrices and their inverses, Box-Cox lambda, 
+            type names and colors
+    """
+    classInfo = _CENTROIDS_CACHE.get(version)
+    if classInfo is not None:
+        return classInfo
+
+    with _CENTROIDS_LOCK:
+        classInfo = _CENTROIDS_CACHE.get(version)
+        if classInfo is None:
+            classInfo = _read_centroids(version)
+            _CENTROIDS_CACHE[version] = classInfo
+
+    return classInfo
+
+
+def _read_centroids(version):
+    proj_root = os.path.dirname(os.path.abspath(__file__))
+    fn = os.path.join(proj_root, f"data/{version}/OWT_centroids.nc")
+    with xr.open_dataset(fn) as ds:
+        mean_OWT = ds['mean'].values
+        covm_OWT = ds['covm'].values
+        lamBC = float(ds.attrs['lamBC'])
+        typeName = tuple(ds.attrs['TypeName'].split(", "))
+        typeColName = tuple(ds.attrs['TypeColorName'].split(", "))
+        typeColHex = tuple(ds.attrs['TypeColorHex'].split(", "))
+
+    # covm_OWT[:, :, i] -> (i, 3, 3) for batched linear algebra, then back to (3, 3, i)
+    covm_stack = np.moveaxis(covm_OWT, -1, 0)
+    covm_inv_OWT = np.moveaxis(np.linalg.inv(covm_stack), 0, -1)
+    chol_inv_OWT = np.moveaxis(np.linalg.inv(np.linalg.cholesky(covm_stack)), 0, -1)
+
+    # whitened differences of type t: z_k = sum_j (x_j - mean[t, j]) * chol_inv[k, j, t]
+    #   for all types at once, z = x @ A - b with z_k of type t in column k * typeNumb + t
+    typeNumb = len(typeName)
+    whiten_A = chol_inv_OWT.transpose(1, 0, 2).reshape(3, 3 * typeNumb)
+    whiten_b = np.einsum("kjt,tj->kt", chol_inv_OWT, mean_OWT).reshape(3 * typeNumb)
+
+    return CentroidSet(
+        version=version,
+        mean_OWT=_read_only(mean_OWT),
+        covm_OWT=_read_only(covm_OWT),
+        covm_inv_OWT=_read_only(covm_inv_OWT),
+        chol_inv_OWT=_read_only(chol_inv_OWT),
+        whiten_A=_read_only(whiten_A),
+        whiten_b=_read_only(whiten_b),
+        lamBC=lamBC,
+        typeName=typeName,
+        typeNumb=typeNumb,
+        typeColName=typeColName,
+        typeColHex=typeColHex,
+    )
+
+
+# number of pixels processed at once by the distance kernel (small enough to stay in CPU cache)
+BLOCK_SIZE = 4096
+
+# inputs up to this number of pixels are evaluated by `classify` without the distance cutoff
+DIRECT_SIZE = 64
+
+
+def _whitened_distance(x, A, b, outs):
+    # squared distances of the (m, 3) features `x` to T types, for whitening `A` (3, 3T) and `b` (3T,)
+    #   with columns k * T + t, as `CentroidSet.whiten_A` and `whiten_b`; the types are split 
+    #   in order into the buffers `outs` (e.g., one per centroid set)
+    T = b.size // 3
+    z = x @ A
+    z -= b
+    np.square(z, out=z)
+    offset = 0
+    for out in outs:
+        cols = slice(offset, offset + out.shape[-1])
+        np.add(z[:, cols], z[:, T:][:, cols], out=out)
+        out += z[:, 2 * T:][:, cols]
+        offset = cols.stop
+
+
+def _stacked_whitening(classInfos):
+    # whitening of several centroid sets at once, i.e., their types are put one after another
+    A = np.concatenate([c.whiten_A.reshape(3, 3, c.typeNumb) for c in classInfos], axis=-1)
+    b = np.concatenate([c.whiten_b.reshape(3, c.typeNumb) for c in classInfos], axis=-1)
+    return A.reshape(3, -1), b.reshape(-1)
+
+
+def mahalanobis_distance(AVW, ABC, NDI, classInfo, out=None, block_size=BLOCK_SIZE):
+    """Squared Mahalanobis distances of all pixels to all OWT centroids
+
+    All types are evaluated together: for each block of pixels, the three variables are 
+    whitened for every type at once by a single matrix product with the stacked inverse
+    Cholesky factors, so neither the (..., 3) feature cube nor per-type temporaries of 
+    the full size are created.
+
+    Args:
+        AVW, ABC, NDI (np.array): optical variables of the same shape; ABC is the Box-Cox 
+            transformed Area
+        classInfo (CentroidSet): centroids from `load_centroids()`
+        out (np.array, optional): buffer of shape AVW.shape + (typeNumb,) to write into
+        block_size (int): number of pixels per block
+
+    Returns:
+        np.array: distances with shape AVW.shape + (typeNumb,)
+    """
+    AVW = np.asarray(AVW, dtype=np.float64)
+    shape = AVW.shape
+    typeNumb = classInfo.typeNumb
+
+    if out is None:
+        out = np.empty(shape + (typeNumb,))
+    elif out.shape != shape + (typeNumb,):
+        raise ValueError(f"The shape of `out` should be {shape + (typeNumb,)}, got {out.shape}")
+
+    A, b = classInfo.whiten_A, classInfo.whiten_b
+
+    features = [AVW.reshape(-1), np.asarray(ABC, dtype=np.float64).reshape(-1), 
+                np.asarray(NDI, dtype=np.float64).reshape(-1)]
+    d = out.reshape(-1, typeNumb)  # a view as long as `out` is contiguous
+    n = d.shape[0]
+    x = np.empty((min(block_size, n), 3))
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        xb = x[:stop - start]
+        for j in range(3):
+            xb[:, j] = features[j][start:stop]
+        _whitened_distance(xb, A, b, [d[start:stop]])
+
+    if not np.shares_memory(d, out):
+        out[...] = d.reshape(out.shape)
+
+    return out
+
+
+def _chi2_df3_sf(d, out=None):
+    # distances are non-negative; large ones are capped to avoid inf * 0 (u is 0 there anyway)
+    h = np.maximum(d, 0, out=out)
+    np.minimum(h, 2000, out=h)
+    h *= 0.5
+    s = np.sqrt(h)
+    np.negative(h, out=h)
+    np.exp(h, out=h)
+    h *= s
+    h *= 2 / np.sqrt(np.pi)
+    h += erfc(s, out=s)
+    return np.round(h, 6, out=h)
+
+
+def _distance_cutoff():
+    # bisect the smallest distance above which the rounded membership is always 0
+    lo, hi = 0.0, 100.0
+    while np.nextafter(lo, hi) < hi:
+        mid = 0.5 * (lo + hi)
+        if _chi2_df3_sf(np.array([mid]))[0] > 0:
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+
+# memberships of distances above this value (~32.09) are 0 after rounding to 6 decimals
+DISTANCE_CUTOFF = _distance_cutoff()
+
+
+def membership_from_distance(d, out=None, cutoff=DISTANCE_CUTOFF):
+    """Membership values from squared Mahalanobis distances of the three optical variables
+
+    The membership is the survival function of the chi-square distribution with three
+    degrees of freedom, which has the closed form
+
+        u = erfc(sqrt(d / 2)) + sqrt(2 * d / pi) * exp(-d / 2)
+
+    and is rounded to 6 decimals as in Bi and Hieronymi (2024). Unlike `1 - chi2.cdf(d, 3)`,
+    it doesn't lose precision in the tail.
+
+    Distances above `cutoff` always give u = 0 after rounding, so they are set to 0 directly
+    and only the remaining ones are evaluated. This pays off when most of type/pixel pairs 
+    are far away from the centroids (e.g., turbid coastal and inland scenes).
+
+    Args:
+        d (np.array): squared Mahalanobis distances (any shape)
+        out (np.array, optional): buffer to write into; pass `out=d` to compute in place
+        cutoff (float, optional): distance above which u = 0. Default as `DISTANCE_CUTOFF`;
+            None evaluates all distances
+
+    Returns:
+        np.array: membership values with the same shape as `d`
+    """
+    d = np.asarray(d)
+    if cutoff is None:
+        return _chi2_df3_sf(d, out=out)
+
+    near = d <= cutoff  # False for NaN
+    n_near = np.count_nonzero(near)
+    if n_near > d.size // 2:
+        # evaluating everything is cheaper than gathering and scattering
+        return _chi2_df3_sf(d, out=out)
+
+    u_near = _chi2_df3_sf(d[near])
+    is_nan = np.isnan(d)
+    if out is None:
+        out = np.empty_like(d)
+    out[...] = 0
+    out[is_nan] = np.nan
+    out[near] = u_near
+    return out
+
+
+def _output_buffer(buf, name, shape, dtype):
+    if buf is None:
+        return np.empty(shape, dtype=dtype)
+    if buf.shape != shape:
+        raise ValueError(f"The shape of `{name}` should be {shape}, got {buf.shape}")
+    if not buf.flags.c_contiguous:
+        raise ValueError(f"`{name}` should be a C-contiguous array")
+    return buf
+
+
+def _boxcox_into(Area, ABC, lamb):
+    # Box-Cox transformation written into `ABC`, as `OWT.trans_boxcox`
+    ABC[...] = np.nan
+    np.power(Area, lamb, out=ABC, where=(Area > 0) & np.isfinite(Area))
+    ABC -= 1
+    ABC /= lamb
+
+
+def _classify_blocks(inputs, outputs, classInfos, thres_u, cutoff, block_size, index=None, top_k=None,
+                     n_workers=None, row_keep=None, row_len=1):
+    # classify flat (1-d) `inputs` (AVW, Area, NDI) block by block into the flat `outputs`, a dict
+    #   per centroid set in `classInfos`, where outputs set to None are only kept per block (e.g., 
+    #   u for the top-k mode); if `index` is given, only these pixels are gathered, classified, 
+    #   and scattered back. Blocks are always calculated in float64 and cast to float32 outputs 
+    #   (if any) when stored. Centroid sets with the same Box-Cox lambda share the features and 
+    #   their distances are calculated together by one matrix product. Blocks are run on
+    #   `n_workers` threads, see `_map_blocks`. For the row rule without the full utot, 
+    #   `row_keep` (a flag per row of `row_len` pixels, per set, or None) is set for rows with 
+    #   any utot above the threshold (or NaN).
+    AVW_, Area_, NDI_ = inputs
+    n = AVW_.size if index is None else index.size
+
+    groups = {}
+    for v, classInfo in enumerate(classInfos):
+        groups.setdefault(classInfo.lamBC, []).append(v)
+    groups = [(lamb, members, *_stacked_whitening([classInfos[v] for v in members])) 
+              for lamb, members in groups.items()]
+
+    def classify_block(start, stop):
+        if index is None:
+            sl = slice(start, stop)
+            m = stop - start
+        else:
+            sl = index[start:stop]
+            m = sl.size
+
+        blks = [_block_buffers(out, sl, m, classInfo.typeNumb, index is None, top_k) 
+                for out, classInfo in zip(outputs, classInfos)]
+
+        xb = np.empty((m, 3))
+        xb[:, 0] = AVW_[sl]
+        xb[:, 2] = NDI_[sl]
+        for lamb, members, A, b in groups:
+            ABC_b = blks[members[0]][0]["ABC"]
+            _boxcox_into(Area_[sl], ABC_b, lamb)
+            xb[:, 1] = ABC_b
+            _whitened_distance(xb, A, b, [blks[v][0]["u"] for v in members])
+            for v in members[1:]:
+                blks[v][0]["ABC"][...] = ABC_b
+
+        for v, (out, (blk, direct)) in enumerate(zip(outputs, blks)):
+            _classify_block(blk, thres_u, cutoff, top_k)
+            for name, buf in blk.items():
+                if out[name] is not None and not direct[name]:
+                    out[name][sl] = buf
+            if row_keep is not None and row_keep[v] is not None:
+                positions = np.arange(start, stop) if index is None else sl
+                row_keep[v][positions[~(blk["utot"] <= thres_u)] // row_len] = True
+
+    _map_blocks(classify_block, n, block_size, n_workers)
+
+
+def _resolve_workers(n_workers):
+    # number of threads for `n_workers`, where None is 1 and -1 (or any value < 0) is all CPUs
+    if n_workers is None:
+        return 1
+    n_workers = int(n_workers)
+    if n_workers == 0:
+        raise ValueError("`n_workers` should be a positive number, or -1 for all CPUs")
+    if n_workers < 0:
+        return os.cpu_count() or 1
+    return n_workers
+
+
+def _map_blocks(func, n, block_size, n_workers=None):
+    # call func(start, stop) for all blocks of `n` pixels, on a pool of `n_workers` threads if > 1
+    #   (NumPy releases the GIL in the heavy parts). Blocks write disjoint parts of the outputs
+    #   and are computed the same way in any thread, so the results don't depend on the order,
+    #   and only the temporaries of the blocks in progress (one per thread) are alive at a time
+    starts = range(0, n, block_size)
+    n_workers = min(_resolve_workers(n_workers), len(starts))
+    if n_workers <= 1:
+        for start in starts:
+            func(start, min(start + block_size, n))
+        return
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        # results are consumed to raise the first error of the workers (if any)
+        for _ in executor.map(lambda start: func(start, min(start + block_size, n)), starts):
+            pass
+
+
+def _block_buffers(outputs, sl, m, typeNumb, contiguous, top_k):
+    # block views of the outputs where they can be written directly, temporaries otherwise
+    shapes = {"u": (typeNumb,), "utot": (), "type_idx": (), "classifiability": (), "ABC": (),
+              "u_topk": (top_k,), "type_topk": (top_k,)}
+    dtypes = {"u": np.float64, "utot": np.float64, "type_idx": np.int8, "classifiability": np.int_,
+              "ABC": np.float64, "u_topk": np.float64, "type_topk": np.int8}
+    blk, direct = {}, {}
+    for name in shapes:
+        if name not in outputs:
+            continue
+        buf = outputs[name]
+        direct[name] = (buf is not None and contiguous and 
+                        (buf.dtype.kind != "f" or buf.dtype == np.float64))
+        if direct[name]:
+            blk[name] = buf[sl]
+        else:
+            dtype = dtypes[name] if (buf is None or buf.dtype.kind == "f") else buf.dtype
+            blk[name] = np.empty((m,) + shapes[name], dtype=dtype)
+    return blk, direct
+
+
+def _classify_block(blk, thres_u, cutoff, top_k):
+    # memberships and types of a block, from the distances in blk["u"]
+    membership_from_distance(blk["u"], out=blk["u"], cutoff=cutoff)
+    _types_from_memberships(blk, thres_u, top_k)
+
+
+def _types_from_memberships(blk, thres_u, top_k):
+    # utot, type_idx, classifiability (and the top-k types) of a block, from the memberships in blk["u"]
+    u_b, utot_b = blk["u"], blk["utot"]
+
+    # types as `OWT.update_type_idx`
+    np.sum(u_b, axis=-1, out=utot_b)
+    idx = np.argmax(u_b, axis=-1)
+    idx[np.all(u_b <= 0, axis=-1) | np.all(np.isnan(u_b), axis=-1)] = -1
+    blk["type_idx"][...] = idx
+
+    # Use Hieronymi et al. (2023) Table 3 to mask out non-classifiable inputs
+    # if utot < thres_u, classifiability = 0; else = 1
+    classifiability_b = blk["classifiability"]
+    classifiability_b[...] = 1
+    classifiability_b[utot_b < thres_u] = 0
+    classifiability_b[idx == -1] = 0
+
+    if top_k is not None:
+        # types sorted by descending memberships (ties by type order, so the first is argmax)
+        order = np.argsort(-u_b, axis=-1, kind="stable")[:, :top_k]
+        u_topk_b = np.take_along_axis(u_b, order, axis=-1)
+        order[~(u_topk_b > 0)] = -1  # zero or NaN memberships
+        blk["u_topk"][...] = u_topk_b
+        blk["type_topk"][...] = order
+
+
+def valid_pixels(AVW, Area, NDI):
+    """Mask of pixels that can be classified, i.e., AVW and NDI are not NaN and Area is positive and finite
+    """
+    return ~np.isnan(AVW) & ~np.isnan(NDI) & (Area > 0) & np.isfinite(Area)
+
+
+def classify_into(AVW, Area, NDI, u=None, utot=None, type_idx=None, classifiability=None, ABC=None,
+                  version='v01', thres_u=0.0001, cutoff=DISTANCE_CUTOFF, block_size=BLOCK_SIZE,
+                  skip_invalid=False, valid=None, top_k=None, u_topk=None, type_topk=None, dtype=np.float64,
+                  dedup=False, dedup_decimals=None, n_workers=None, outputs=None):
+    """Run the OWT classification and write the results into caller-provided buffers
+
+    This is the lower-level entry point behind `OWT`. Pixels are processed block by block, 
+    so apart from the outputs only block-sized temporaries are created. For tile-by-tile 
+    processing, allocate the outputs once and pass them for every tile to run with 
+    constant memory. Outputs that are not given are allocated.
+
+    With `skip_invalid`, only valid pixels (see `valid_pixels`) are gathered and classified,
+    which saves the work on land, cloud, or flagged (NaN) pixels. The others are filled 
+    directly with the results they would get anyway: u and utot are NaN, type_idx is -1, 
+    and classifiability is 0.
+
+    With `top_k`, the k types with the highest memberships and their memberships are returned 
+    as `type_topk` and `u_topk` (sorted in descending order, type -1 for zero or NaN memberships).
+    If `u` is not given in this mode, the full membership cube is never kept, e.g., for k = 2 
+    the outputs take about 5 times less memory.
+
+    Float inputs are used as they are (e.g., float32 from `OpticalVariables(..., dtype=np.float32)`),
+    and `dtype` sets the type of float outputs. Distances and memberships are always calculated 
+    in float64 per block, so float32 outputs only round the stored values.
+
+    With `dedup`, only the unique (AVW, Area, NDI) triples of valid pixels are classified
+    and their results are broadcast back to the pixels, which pays off for quantized and 
+    spatially smooth products (e.g., Lake CCI, CMEMS) where many pixels share the same values.
+    The triples can be rounded to `dedup_decimals` first to find more duplicates, in which 
+    case the results are those of the rounded inputs. The number of valid and unique pixels 
+    and their ratio are reported in `meta`.
+
+    With `n_workers`, the blocks are classified on a pool of threads (NumPy releases the GIL 
+    in the heavy parts). Every block is computed the same way in any thread and written to 
+    its own part of the outputs, so the results are identical to those of a single thread, 
+    and the memory only grows by the block-sized temporaries per thread.
+
+    With `outputs`, only the named outputs (and the given buffers) are kept, the others are
+    None and never allocated, e.g., `outputs=['type_idx']` only keeps the block-sized 
+    memberships in progress. The row rule of `OWT.update_type_idx` is then applied by a 
+    flag per row instead of the full utot.
+
+    Args:
+        AVW, Area, NDI (np.array): optical variables of the same shape
+        u (np.array, optional): float buffer of shape AVW.shape + (typeNumb,) for memberships
+        utot (np.array, optional): float buffer of shape AVW.shape for total memberships
+        type_idx (np.array, optional): signed integer buffer of shape AVW.shape for types 
+            (index of `typeName`, -1 once not classifiable)
+        classifiability (np.array, optional): integer buffer of shape AVW.shape, 1 for 
+            classifiable inputs and 0 otherwise
+        ABC (np.array, optional): float buffer of shape AVW.shape for the Box-Cox transformed Area
+        version (str): Version of the classification centroids. Default as 'v01'.
+        thres_u (numeric): the threshold of membership (u) to mask out non-classifiable inputs.
+        cutoff (float, optional): see `membership_from_distance`
+        block_size (int): number of pixels per block
+        skip_invalid (bool): only classify valid pixels. Default as False.
+        valid (np.array, optional): boolean mask of shape AVW.shape of the pixels to be 
+            classified, if already known (e.g., from `OpticalVariables.valid`); implies `skip_invalid`
+        top_k (int, optional): number of dominant types to be returned. Default as None.
+        u_topk (np.array, optional): float buffer of shape AVW.shape + (top_k,) for memberships
+            of the dominant types
+        type_topk (np.array, optional): signed integer buffer of shape AVW.shape + (top_k,) for 
+            the dominant types
+        dtype (np.dtype): floating type of the outputs u, utot, ABC, and u_topk. Default as np.float64.
+        dedup (bool): only classify the unique triples of valid pixels. Default as False.
+        dedup_decimals (int or tuple, optional): decimals to round AVW, Area, and NDI (a number 
+            for all or one for each, None for not rounded) before finding duplicates. Default as 
+            None, that is only exactly equal triples are merged and the results are unchanged.
+        n_workers (int, optional): number of threads, -1 for all CPUs. Default as None (one thread).
+        outputs (list, optional): outputs to keep, from 'ABC', 'u', 'utot', 'type_idx', 
+            'classifiability', 'u_topk', and 'type_topk'. Default as None, that is all of them.
+
+    Returns:
+        SimpleNamespace: ABC, u, utot, type_idx, and classifiability (the given buffers if any),
+            plus u_topk and type_topk if `top_k` is set (u is None if not given in this case),
+            where outputs not in `outputs` are None,
+            and `meta` (dict of n_pixels, n_unique, and compression_ratio) if `dedup` is set
+
+    Examples:
+
+        u = np.empty(tile_shape + (10,))
+        utot, type_idx = np.empty(tile_shape), np.empty(tile_shape, dtype=np.int8)
+        for AVW, Area, NDI in tiles:
+            classify_into(AVW, Area, NDI, u=u, utot=utot, type_idx=type_idx)
+    """
+    classInfo = load_centroids(version)
+    typeNumb = classInfo.typeNumb
+
+    AVW, Area, NDI = [x if x.dtype.kind == "f" else x.astype(np.float64) 
+                      for x in map(np.asarray, (AVW, Area, NDI))]
+
+    if not (AVW.shape == Area.shape == NDI.shape):
+        raise ValueError("The shapes of AVW, Area, and NDI must be the same!")
+
+    names = ["ABC", "u", "utot", "type_idx", "classifiability", "u_topk", "type_topk"]
+    if outputs is not None:
+        unknown = set(outputs) - set(names)
+        if unknown:
+            raise ValueError(f"Unknown outputs {sorted(unknown)}, should be from {names}")
+
+    def keep(name, buf):
+        return buf is not None or outputs is None or name in outputs
+
+    shape = AVW.shape
+    result = {
+        "ABC": _output_buffer(ABC, "ABC", shape, dtype) if keep("ABC", ABC) else None,
+        "u": (_output_buffer(u, "u", shape + (typeNumb,), dtype) 
+              if (top_k is None or u is not None) and keep("u", u) else None),
+        "utot": _output_buffer(utot, "utot", shape, dtype) if keep("utot", utot) else None,
+        "type_idx": _output_buffer(type_idx, "type_idx", shape, np.int8) if keep("type_idx", type_idx) else None,
+        "classifiability": (_output_buffer(classifiability, "classifiability", shape, np.int_) 
+                            if keep("classifiability", classifiability) else None),
+    }
+    if top_k is not None:
+        if not 1 <= top_k <= typeNumb:
+            raise ValueError(f"`top_k` should be from 1 to {typeNumb}, got {top_k}")
+        result["u_topk"] = (_output_buffer(u_topk, "u_topk", shape + (top_k,), dtype) 
+                            if keep("u_topk", u_topk) else None)
+        result["type_topk"] = (_output_buffer(type_topk, "type_topk", shape + (top_k,), np.int8) 
+                               if keep("type_topk", type_topk) else None)
+
+    meta = _run_classification((AVW, Area, NDI), [result], [classInfo], thres_u, cutoff, block_size,
+                               skip_invalid, valid, top_k, dedup=dedup, dedup_decimals=dedup_decimals,
+                               n_workers=n_workers)
+
+    if dedup:
+        return SimpleNamespace(**result, meta=meta)
+    return SimpleNamespace(**result)
+
+
+def _run_classification(inputs, results, classInfos, thres_u, cutoff, block_size, skip_invalid, valid, top_k,
+                        dedup=False, dedup_decimals=None, n_workers=None):
+    # classify `inputs` into the `results` (a dict of output buffers per centroid set, None for 
+    #   outputs not kept) on flat views, then apply the row rule of `OWT.update_type_idx`
+    #   (by flags per row, for results without utot); returns the statistics of the 
+    #   deduplication if `dedup`
+    AVW, Area, NDI = inputs
+    shape = AVW.shape
+    flat_inputs = (AVW.reshape(-1), Area.reshape(-1), NDI.reshape(-1))
+    flat_outputs = [{name: None if buf is None else buf.reshape((-1,) + buf.shape[len(shape):]) 
+                     for name, buf in result.items()} for result in results]
+    meta = None
+
+    row_keep, row_len = None, 1
+    if len(shape) > 0 and any(result["utot"] is None for result in results):
+        row_len = max(shape[-1], 1)
+        row_keep = [np.zeros(AVW.size // row_len, dtype=bool) if result["utot"] is None else None 
+                    for result in results]
+    
+    if (skip_invalid or dedup) and valid is None:
+        valid = valid_pixels(AVW, Area, NDI)
+
+    if valid is None:
+        _classify_blocks(flat_inputs, flat_outputs, classInfos, thres_u, cutoff, block_size, top_k=top_k,
+                         n_workers=n_workers, row_keep=row_keep, row_len=row_len)
+    else:
+        valid = np.asarray(valid, dtype=bool)
+        if valid.shape != shape:
+            raise ValueError(f"The shape of `valid` should be {shape}, got {valid.shape}")
+        valid_ = valid.reshape(-1)
+        if dedup:
+            meta = _classify_unique(flat_inputs, flat_outputs, classInfos, np.flatnonzero(valid_), 
+                                    dedup_decimals, thres_u, cutoff, block_size, top_k, n_workers,
+                                    row_keep=row_keep, row_len=row_len)
+        else:
+            _classify_blocks(flat_inputs, flat_outputs, classInfos, thres_u, cutoff, block_size, 
+                             index=np.flatnonzero(valid_), top_k=top_k, n_workers=n_workers,
+                             row_keep=row_keep, row_len=row_len)
+
+        # results of invalid pixels
+        invalid = ~valid_
+        fill_values = {"u": np.nan, "utot": np.nan, "type_idx": -1, "classifiability": 0,
+                       "u_topk": np.nan, "type_topk": -1}
+        for flat, classInfo in zip(flat_outputs, classInfos):
+            for name, value in fill_values.items():
+                if flat.get(name) is not None:
+                    flat[name][invalid] = value
+            if flat["ABC"] is not None:
+                flat["ABC"][invalid] = OWT.trans_boxcox(flat_inputs[1][invalid], classInfo.lamBC)
+
+        # utot of invalid pixels is NaN
+        if row_keep is not None:
+            for keep in row_keep:
+                if keep is not None:
+                    keep[np.flatnonzero(invalid) // row_len] = True
+
+    if len(shape) > 0:
+        for v, result in enumerate(results):
+            keep = None if row_keep is None else row_keep[v]
+            _mask_rows(result, thres_u, keep=None if keep is None else keep.reshape(shape[:-1]))
+
+    return meta
+
+
+def _mask_rows(result, thres_u, keep=None):
+    # as `OWT.update_type_idx`, which checks utot <= thres_u along the last axis, for the
+    #   outputs in the dict `result` (type_idx and classifiability may be None), or by the 
+    #   flags `keep` of rows with any utot above the threshold if given
+    if keep is None:
+        mask_blt_thres = np.all(result["utot"] <= thres_u, axis=-1)
+    else:
+        mask_blt_thres = ~keep
+    for name, value in [("type_idx", -1), ("classifiability", 0)]:
+        if result.get(name) is not None:
+            result[name][mask_blt_thres] = value
+
+
+def _classify_unique(inputs, outputs, classInfos, index, decimals, thres_u, cutoff, block_size, top_k,
+                     n_workers=None, row_keep=None, row_len=1):
+    # classify the unique (rounded) triples of the `index` pixels only and broadcast them back
+    if decimals is None or np.ndim(decimals) == 0:
+        decimals = (decimals,) * 3
+    if len(decimals) != 3:
+        raise ValueError(f"`dedup_decimals` should be a number or three for AVW, Area, and NDI, got {decimals}")
+
+    triples = np.empty((index.size, 3), dtype=np.result_type(*inputs))
+    for j, (x, dec) in enumerate(zip(inputs, decimals)):
+        triples[:, j] = x[index]
+        if dec is not None:
+            np.round(triples[:, j], dec, out=triples[:, j])
+
+    # codes of the unique values (by hashing) are combined column by column into one integer 
+    #   key per triple, which is much faster than np.unique(triples, axis=0); NaN gets a code of
+    #   its own (not the sentinel -1, which would collide with the codes of other triples)
+    key = np.zeros(index.size, dtype=np.int64)
+    for j in range(3):
+        codes, values = factorize(triples[:, j], use_na_sentinel=False)
+        key, _ = factorize(key * values.size + codes)
+    inverse = key
+    n_unique = int(inverse.max(initial=-1)) + 1  # codes are 0, 1, ... in order of appearance
+
+    # any pixel of a triple stands for it
+    representative = np.empty(n_unique, dtype=np.intp)
+    representative[inverse] = np.arange(index.size)
+    unique = triples[representative]
+
+    unique_outputs = [{name: None if buf is None else np.empty((n_unique,) + buf.shape[1:], dtype=buf.dtype)
+                       for name, buf in out.items()} for out in outputs]
+    if row_keep is not None:
+        # utot of the unique triples for the row flags (only kept here)
+        for unique_out, keep in zip(unique_outputs, row_keep):
+            if keep is not None:
+                unique_out["utot"] = np.empty(n_unique)
+    _classify_blocks(tuple(np.ascontiguousarray(unique.T)), unique_outputs, classInfos, thres_u, cutoff, 
+                     block_size, top_k=top_k, n_workers=n_workers)
+
+    for v, (out, unique_out) in enumerate(zip(outputs, unique_outputs)):
+        for name, buf in out.items():
+            if buf is not None:
+                buf[index] = unique_out[name][inverse]
+        if row_keep is not None and row_keep[v] is not None:
+            above = ~(unique_out["utot"] <= thres_u)
+            row_keep[v][index[above[inverse]] // row_len] = True
+
+    return {"n_pixels": index.size, "n_unique": n_unique, 
+            "compression_ratio": index.size / n_unique if n_unique > 0 else 1.0}
+
+
+def classify(AVW, Area, NDI, version='v01', thres_u=0.0001, valid=None, dtype=np.float64, n_workers=None):
+    """Stateless OWT classification with a light overhead for a few spectra
+
+    Unlike `OWT`, nothing but the results is created: the cached centroids from 
+    `load_centroids()` are used, and inputs up to `BLOCK_SIZE` pixels are classified 
+    directly in one go, while larger ones are passed to `classify_into` to run block by 
+    block. Up to `DIRECT_SIZE` pixels, all memberships are evaluated without the distance
+    cutoff. A single spectrum takes ~70 us, about 2.5 times faster than `OWT` but still
+    far from microseconds, as it is bound by the ~30 numpy calls of ~1-2 us each (see
+    `projects/benchmarks/benchmark_latency.py`).
+
+    Inputs with less than two dims are taken as samples, i.e., as the (samples, 1) outputs 
+    of `OpticalVariables` for (samples, bands) Rrs, so the threshold of `OWT.update_type_idx`
+    (utot <= thres_u along the last axis) applies per sample. The results are the same as 
+    those of `OWT` for the (samples, 1) inputs.
+
+    Args:
+        AVW, Area, NDI (array_like): optical variables of the same shape (or scalars)
+        version (str): Version of the classification centroids. Default as 'v01'.
+        thres_u (numeric): the threshold of membership (u) to mask out non-classifiable inputs.
+        valid (np.array, optional): boolean mask of the pixels to be classified, see `classify_into`.
+            Only used to skip invalid pixels of large inputs, as the results are the same.
+        dtype (np.dtype): floating type of the outputs u, utot, and ABC. Default as np.float64.
+        n_workers (int, optional): number of threads for large inputs, see `classify_into`.
+
+    Returns:
+        SimpleNamespace: ABC, u, utot, type_idx, and classifiability in the shape of the inputs 
+            (u with an extra last dim for types)
+
+    Examples:
+
+        res = pyowt.classify(560, 1, 0.5)
+        print(res.type_idx, res.u)
+    """
+    classInfo = load_centroids(version)
+    AVW, Area, NDI = [np.asarray(x, dtype=np.float64) for x in (AVW, Area, NDI)]
+
+    if not (AVW.shape == Area.shape == NDI.shape):
+        raise ValueError("The shapes of AVW, Area, and NDI must be the same!")
+
+    shape = AVW.shape
+    work_shape = shape + (1,) * max(0, 2 - len(shape))
+
+    if AVW.size > BLOCK_SIZE:
+        result = classify_into(AVW.reshape(work_shape), Area.reshape(work_shape), NDI.reshape(work_shape),
+                               version=version, thres_u=thres_u, 
+                               valid=None if valid is None else np.reshape(valid, work_shape), dtype=dtype,
+                               n_workers=n_workers)
+        return SimpleNamespace(**{name: arr.reshape(shape + arr.shape[len(work_shape):]) 
+                                  for name, arr in vars(result).items()})
+
+    # the steps of `_classify_blocks` for a single block
+    typeNumb = classInfo.typeNumb
+    x = np.empty((AVW.size, 3))
+    x[:, 0] = AVW.reshape(-1)
+    x[:, 2] = NDI.reshape(-1)
+    ABC = np.empty(AVW.size)
+    _boxcox_into(Area.reshape(-1), ABC, classInfo.lamBC)
+    x[:, 1] = ABC
+
+    u = np.empty((AVW.size, typeNumb))
+    _whitened_distance(x, classInfo.whiten_A, classInfo.whiten_b, [u])
+    if AVW.size <= DIRECT_SIZE:
+        # gathering the near distances doesn't pay off for a few spectra (same results)
+        _chi2_df3_sf(u, out=u)
+    else:
+        membership_from_distance(u, out=u)
+
+    # (array methods are used, which are faster than the numpy functions for tiny arrays)
+    utot = u.sum(axis=-1)
+    type_idx = u.argmax(axis=-1).astype(np.int8)
+    if work_shape[-1] == 1:
+        # one pixel per row, so the checks below reduce to utot > thres_u (False for NaN)
+        keep = utot > thres_u
+        type_idx[~keep] = -1
+        classifiability = keep.astype(np.int_)
+    else:
+        type_idx[(u <= 0).all(axis=-1) | np.isnan(u).all(axis=-1)] = -1
+        classifiability = (~(utot < thres_u) & (type_idx != -1)).astype(np.int_)
+
+        # as `OWT.update_type_idx`, which checks utot <= thres_u along the last axis
+        utot, type_idx, classifiability = [arr.reshape(work_shape) for arr in (utot, type_idx, classifiability)]
+        mask_blt_thres = (utot <= thres_u).all(axis=-1)
+        type_idx[mask_blt_thres] = -1
+        classifiability[mask_blt_thres] = 0
+
+    return SimpleNamespace(
+        ABC=ABC.reshape(shape).astype(dtype, copy=False),
+        u=u.reshape(shape + (typeNumb,)).astype(dtype, copy=False),
+        utot=utot.reshape(shape).astype(dtype, copy=False),
+        type_idx=type_idx.reshape(shape),
+        classifiability=classifiability.reshape(shape),
+    )
+
+
+def classify_versions(AVW, Area, NDI, versions=('v01', 'v02'), outputs=('u', 'utot', 'type_idx'),
+                      thres_u=0.0001, cutoff=DISTANCE_CUTOFF, block_size=BLOCK_SIZE,
+                      skip_invalid=False, valid=None, dtype=np.float64, n_workers=None):
+    """Run the OWT classification with several versions of centroids in one pass
+
+    The inputs are checked, the Box-Cox transformed Area and the feature blocks are calculated 
+    only once for all versions (once per Box-Cox lambda if versions differ in it), and the 
+    distances to the centroids of all versions are calculated by a single matrix product 
+    per block. Only the requested `outputs` are kept, so the memory grows with the outputs 
+    kept rather than with the work per version. The results are the same as those of 
+    `classify_into` (or `OWT`) run for each version.
+
+    Args:
+        AVW, Area, NDI (np.array): optical variables of the same shape
+        versions (list): Versions of the classification centroids. Default as ('v01', 'v02').
+        outputs (list): outputs kept per version, from 'u', 'utot', 'type_idx', 'classifiability',
+            and 'ABC'. Default as ('u', 'utot', 'type_idx').
+        thres_u (numeric): the threshold of membership (u) to mask out non-classifiable inputs.
+        cutoff (float, optional): see `membership_from_distance`
+        block_size (int): number of pixels per block
+        skip_invalid (bool): only classify valid pixels. Default as False.
+        valid (np.array, optional): boolean mask of the pixels to be classified, see `classify_into`
+        dtype (np.dtype): floating type of the outputs u, utot, and ABC. Default as np.float64.
+        n_workers (int, optional): number of threads, see `classify_into`. Default as None (one thread).
+
+    Returns:
+        dict: a SimpleNamespace of the requested outputs per version
+
+    Examples:
+
+        res = classify_versions(ov.AVW, ov.Area, ov.NDI, versions=['v01', 'v02'])
+        changed = res['v01'].type_idx != res['v02'].type_idx
+    """
+    names = ["u", "utot", "type_idx", "classifiability", "ABC"]
+    unknown = set(outputs) - set(names)
+    if unknown:
+        raise ValueError(f"Unknown outputs {sorted(unknown)}, should be from {names}")
+    if len(set(versions)) != len(versions):
+        raise ValueError("`versions` should not contain duplicates")
+
+    classInfos = [load_centroids(version) for version in versions]
+
+    AVW, Area, NDI = [x if x.dtype.kind == "f" else x.astype(np.float64) 
+                      for x in map(np.asarray, (AVW, Area, NDI))]
+
+    if not (AVW.shape == Area.shape == NDI.shape):
+        raise ValueError("The shapes of AVW, Area, and NDI must be the same!")
+
+    shape = AVW.shape
+    results = []
+    for classInfo in classInfos:
+        buffers = {
+            "u": (shape + (classInfo.typeNumb,), dtype),
+            "utot": (shape, dtype),
+            "type_idx": (shape, np.int8),
+            "classifiability": (shape, np.int_),
+            "ABC": (shape, dtype),
+        }
+        # (without utot, the row rule of `OWT.update_type_idx` is applied by flags per row)
+        results.append({name: np.empty(*buffers[name]) if name in outputs else None for name in names})
+
+    _run_classification((AVW, Area, NDI), results, classInfos, thres_u, cutoff, block_size,
+                        skip_invalid, valid, top_k=None, n_workers=n_workers)
+
+    return {version: SimpleNamespace(**{name: result[name] for name in names if name in outputs})
+            for version, result in zip(versions, results)}
+
 
 class OWT():
 
-    def __init__(self, AVW=None, Area=None, NDI=None, version='v01', thres_u=0.0001):
+    # memberships of distances above the cutoff are set to 0 without evaluation
+    distance_cutoff = DISTANCE_CUTOFF
+
+    def __init__(self, AVW=None, Area=None, NDI=None, version='v01', thres_u=0.0001, skip_invalid=False,
+                 top_k=None, dtype=np.float64, dedup=False, dedup_decimals=None, n_workers=None):
         """Initialize three optical variables for spectral classification
 
         Args:
-            AVW (np.array, ndim <= 2): Apparent Visible Wavelength 400-800 nm
-            Area (np.array, ndim <= 2): Trapezoidal area of Rrs at RGB bands
-            NDI (np.array, ndim <= 2): Normalized Difference Index of Rrs at G and B bands
+            AVW (np.array): Apparent Visible Wavelength 400-800 nm
+            Area (np.array): Trapezoidal area of Rrs at RGB bands
+            NDI (np.array): Normalized Difference Index of Rrs at G and B bands
+                All three of the same shape with any number of dims, e.g., (time, lat, lon) 
+                from `OpticalVariables(..., band_axis=0)`; inputs with less than two dims 
+                are taken as np.atleast_2d
             version (str): Version of the classification centroids. Default as 'v01'.
                 Two version are now included:
                     - v01: original from Bi and Hieronymi (2024) paper
                     - v02: revised version of v01 which covariance matrix were shrinked
             thre_u (numeric): the threshold of membership (u) to mask out non-classifiable inputs.
                 Default as 0.0001 from Hieronymi et al. (2023) Table 3.
+            skip_invalid (bool): only classify valid pixels (non-NaN AVW and NDI, positive Area),
+                which saves time for mostly NaN satellite scenes. Results are the same. Default as False.
+            top_k (int, optional): if given, only keep the memberships of the k dominant types 
+                (`u_topk` and `type_topk`, sorted by descending memberships) instead of `u` for 
+                all types, which takes much less memory for large scenes. Default as None.
+            dtype (np.dtype): floating type of the outputs (u, utot, ABC), e.g., np.float32 to halve
+                the memory. The calculation is always done in float64. Default as np.float64.
+            dedup (bool): only classify the unique (AVW, Area, NDI) triples and broadcast the results
+                back, which saves time for quantized products where many pixels share the same values.
+                The compression ratio is reported in `meta`. Default as False.
+            dedup_decimals (int or tuple, optional): decimals to round the triples (all or each of 
+                AVW, Area, and NDI) before finding duplicates, see `classify_into`. Default as None 
+                (not rounded, so the results are unchanged).
+            n_workers (int, optional): number of threads to classify the blocks of pixels on, -1 for 
+                all CPUs. The results are identical to those of a single thread. Default as None (one thread).
 
         Return:
-            u (np.array, ndim = 3): the first and second dims are from AVW or np.atleast_2d(AVW).
+            u (np.array): the first dims are from AVW (or np.atleast_2d(AVW)).
               Its last dim is water type (N = 10)
         """
 
@@ -30,10 +891,6 @@ class OWT():
         self.Area = Area
         self.NDI = NDI
 
-        if any(np.ndim(arr) > 2 for arr in [self.AVW, self.Area, self.NDI]):
-
-            raise ValueError("AVW, Area, and NDI with more than two dims are not supported!")
-
         self.AVW = np.atleast_2d(self.AVW)
         self.Area = np.atleast_2d(self.Area)
         self.NDI = np.atleast_2d(self.NDI)
@@ -44,6 +901,12 @@ class OWT():
 
         # set the threshold of membership values for classifiable results
         self.thres_u = thres_u
+        self.skip_invalid = skip_invalid
+        self.top_k = top_k
+        self.dtype = dtype
+        self.dedup = dedup
+        self.dedup_decimals = dedup_decimals
+        self.n_workers = n_workers
 
         # load pre-trained centroids
         self.version = version
@@ -75,21 +938,18 @@ class OWT():
         dict_idx_color[-1] = "#808080" # once not classifiable
         self.dict_idx_color = {key: dict_idx_color[key] for key in sorted(dict_idx_color)}
 
-        
-        # placeholder
-        self.u = np.full(self.AVW.shape + (self.classInfo.typeNumb,), None)
-        self.type_idx = np.full(self.AVW.shape, None)
-        self.type_str = np.full(self.AVW.shape, None)
+        # lookup table from type_idx to type_str, where -1 (the last element) is "NaN"
+        self._type_str_lut = np.array([self.dict_idx_name[i] for i in range(self.classInfo.typeNumb)] + 
+                                      [self.dict_idx_name[-1]])
+
+        # filled by `run_classification`; `type_str` is only mapped once accessed
+        self.u = None
+        self.type_idx = None
+        self._type_str = None
 
         # run classification
         self.run_classification()
 
-        # Use Hieronymi et al. (2023) Table 3 to mask out non-classifiable inputs
-        # if utot < thres_u, classifiability = 0; else = 1
-        self.classifiability = np.full(self.AVW.shape, 1) 
-        self.classifiability[self.utot < self.thres_u] = 0
-        self.classifiability[self.type_idx == -1] = 0
-
 
     def update_type_idx(self):
         """Update the type (index of `typeName`) based on the current membership value. 
@@ -97,8 +957,9 @@ class OWT():
         OWT will be asigned to -1 if all memberships are zero or below the threshold `thres_u`.
         """
         if self.u is not None:
-            idx_max = np.argmax(self.u, axis=-1)
+            idx_max = np.argmax(self.u, axis=-1).astype(np.int8)
             self.type_idx = idx_max
+            self._type_str = None
             mask_all_zero = np.all(self.u <= 0, axis=-1)
             self.type_idx[mask_all_zero] = -1
             mask_all_nan = np.all(np.isnan(self.u), axis=-1)
@@ -112,13 +973,21 @@ class OWT():
     def update_type_str(self):
         """Update the type (name in `typeName`) based on `self.type_idx`
         """
-        if self.u is not None:
-            vectorized_map = np.vectorize(lambda x: self.dict_idx_name.get(x, ''))
-            self.type_str = vectorized_map(self.type_idx)
+        if self.type_idx is not None:
+            self._type_str = self._type_str_lut[self.type_idx]
         else:
             raise ValueError("Membership values have not been calculated! Run the classification first")
 
 
+    @property
+    def type_str(self):
+        """Type names (`typeName`, or "NaN" once not classifiable), mapped from `type_idx` on first access
+        """
+        if self._type_str is None:
+            self.update_type_str()
+        return self._type_str
+
+
     def run_classification(self):
         """Run the classification procedure
 
@@ -135,26 +1004,99 @@ class OWT():
             stacklevel=2
         )
         
-        self.ABC = self.trans_boxcox(self.Area, self.classInfo.lamBC)
+        result = classify_into(self.AVW, self.Area, self.NDI, version=self.version, 
+                               thres_u=self.thres_u, cutoff=self.distance_cutoff, 
+                               skip_invalid=self.skip_invalid, top_k=self.top_k, dtype=self.dtype,
+                               dedup=self.dedup, dedup_decimals=self.dedup_decimals, n_workers=self.n_workers)
 
-        x = np.array([self.AVW, self.ABC, self.NDI]).transpose(1, 2, 0)
-        d = np.zeros((x.shape[0], x.shape[1], self.classInfo.typeNumb))
+        self.ABC = result.ABC
+        self.u = result.u
+        self.utot = result.utot
+        self.type_idx = result.type_idx
+        self.classifiability = result.classifiability
+        self._type_str = None
 
-        for i in range(self.classInfo.typeNumb):
+        if self.top_k is not None:
+            self.u_topk = result.u_topk
+            self.type_topk = result.type_topk
 
-            y = self.classInfo.mean_OWT[i, :][None, None, :]
-            covm = self.classInfo.covm_OWT[:, :, i]
-            covm_inv = np.linalg.inv(covm)
-            diff = x - y 
-            d[:, :, i] = np.einsum("...i,ij,...j->...", diff, covm_inv, diff)
-        
-        u = np.round(1 - chi2.cdf(d, df=x.shape[2]), 6)
+        if self.dedup:
+            self.meta = result.meta
+
+    def _type_idx_unmasked(self):
+        # type_idx before the row rule of `update_type_idx` (utot <= thres_u along the last axis), 
+        #   which is only recovered from the memberships for the masked rows
+        type_idx = self.type_idx.copy()
+        rows = np.all(self.utot <= self.thres_u, axis=-1)
+        if np.any(rows):
+            if self.u is not None:
+                u = self.u[rows]
+                idx = np.argmax(u, axis=-1).astype(np.int8)
+                idx[np.all(u <= 0, axis=-1) | np.all(np.isnan(u), axis=-1)] = -1
+            else:
+                idx = self.type_topk[rows][..., 0]
+            type_idx[rows] = idx
+        return type_idx
+
+    def reclassify(self, thres_u):
+        """Update `type_idx` and `classifiability` for a new membership threshold
+
+        Memberships don't depend on the threshold, so only the masks are rerun from the kept 
+        `u` and `utot` (or `type_topk` in the top-k mode), which is much cheaper than creating 
+        a new instance.
+
+        Args:
+            thres_u (numeric): the threshold of membership (u) to mask out non-classifiable inputs.
+        """
+        type_idx = self._type_idx_unmasked()
+        self.thres_u = thres_u
+
+        classifiability = np.ones(type_idx.shape, dtype=np.int_)
+        classifiability[self.utot < thres_u] = 0
+        classifiability[type_idx == -1] = 0
+
+        mask_blt_thres = np.all(self.utot <= thres_u, axis=-1)
+        type_idx[mask_blt_thres] = -1
+        classifiability[mask_blt_thres] = 0
+
+        self.type_idx = type_idx
+        self.classifiability = classifiability
+        self._type_str = None
+
+    def sweep_thres_u(self, thres_u):
+        """Number of classifiable pixels per type for many membership thresholds at once
 
-        self.u = u
-        self.utot = np.sum(u, axis=-1)
+        The counts are the same as those from `reclassify()` for each threshold, i.e., 
+        `np.bincount(type_idx[classifiability == 1])`, but are found by sorting the total 
+        memberships once per type, so the instance itself is not changed.
 
-        self.update_type_idx()
-        self.update_type_str()
+        Args:
+            thres_u (list): thresholds of membership (u)
+
+        Returns:
+            pd.DataFrame: counts with thresholds as index and `typeName` as columns, 
+                plus the "NaN" column for non-classifiable pixels
+        """
+        import pandas as pd
+
+        index = pd.Index(np.asarray(thres_u, dtype=np.float64).reshape(-1), name="thres_u")
+        # thresholds are compared in the type of utot, as in `reclassify()`
+        thres_u = index.values.astype(self.utot.dtype)
+        type_idx = self._type_idx_unmasked()
+
+        # a pixel is classifiable for all thresholds up to its key: not utot < thres_u 
+        #   (always true for NaN), and not all utot <= thres_u along the last axis
+        row_max = np.where(np.any(np.isnan(self.utot), axis=-1), np.inf, np.max(self.utot, axis=-1))
+        utot = np.where(np.isnan(self.utot), np.inf, self.utot)
+        key = np.minimum(utot, np.nextafter(row_max, -np.inf, dtype=utot.dtype)[..., None])
+
+        counts = np.empty((thres_u.size, self.classInfo.typeNumb + 1), dtype=np.int64)
+        for i in range(self.classInfo.typeNumb):
+            key_i = np.sort(key[type_idx == i])
+            counts[:, i] = key_i.size - np.searchsorted(key_i, thres_u, side="left")
+        counts[:, -1] = type_idx.size - counts[:, :-1].sum(axis=1)
+
+        return pd.DataFrame(counts, index=index, columns=list(self._type_str_lut))
 
     def load_centroids_version(self, version):
         """
@@ -165,32 +1107,11 @@ class OWT():
         - [lamBC] lambda coeffcient for the Box-Cox transformation
         Dimensions: [AVW, Area, NDI]
         Note: Area in the nc lib is after Box-Cox transformation
+        The file is only read once per process, see `load_centroids()`
         """
-        proj_root = os.path.dirname(os.path.abspath(__file__))
-        fn = os.path.join(proj_root, f"data/{version}/OWT_centroids.nc")
-        ds = xr.open_dataset(fn)
-        mean_OWT = ds['mean'].values
-        covm_OWT = ds['covm'].values
-        lamBC = ds.attrs['lamBC']
-        typeName = ds.attrs['TypeName'].split(", ")
-        typeNumb = len(typeName)
-        typeColName = ds.attrs['TypeColorName'].split(", ")
-        typeColHex = ds.attrs['TypeColorHex'].split(", ")
-
         # mean_OWT[0,:] returns 1x3 matrix for the first OWT
         # covm_OWT[:,:,0] returns 3x3 matrix for the first OWT
-        result = {
-            "mean_OWT": mean_OWT,
-            "covm_OWT": covm_OWT,
-            "lamBC": lamBC,
-            "typeName": typeName,
-            "typeNumb": typeNumb,
-            "typeColName": typeColName,
-            "typeColHex": typeColHex,
-        }
-        result = SimpleNamespace(**result)
-
-        return result
+        return load_centroids(version)
     
     @staticmethod
     def load_centroids_dep():
@@ -3,20 +3,265 @@ import numpy as np
 import os
 import yaml
 import json
+import threading
+from collections import namedtuple
+from types import MappingProxyType, SimpleNamespace
 from scipy.interpolate import interp1d
 
+
+# process-wide cache of the parsed sensor band library and the compiled sensor profiles, keyed by
+#   file path (or name); they are shared by all `OpticalVariables` instances and must not be modified.
+#   The lock is re-entrant as the profiles are compiled from the cached library.
+_SENSOR_LIBRARY_CACHE = {}
+_SENSOR_LIBRARY_LOCK = threading.RLock()
+
+
+def _load_once(path, reader, key=None):
+    # read `path` by `reader` once per process (cached by `key`, the path by default)
+    key = path if key is None else key
+    content = _SENSOR_LIBRARY_CACHE.get(key)
+    if content is not None:
+        return content
+
+    with _SENSOR_LIBRARY_LOCK:
+        content = _SENSOR_LIBRARY_CACHE.get(key)
+        if content is None:
+            content = reader(path)
+            _SENSOR_LIBRARY_CACHE[key] = content
+
+    return content
+
+
+def _read_yaml(path):
+    with open(path, 'r') as file:
+        return yaml.load(file, Loader=yaml.FullLoader)
+
+
+def _sensor_library_path():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    data_dir = os.path.join(base_dir, 'data')
+    path_sensor_band_library = os.path.join(data_dir, 'sensor_band_library.yaml')
+
+    if not os.path.isfile(path_sensor_band_library):
+        # we're obviously in a different env with a different cwd, so read path from config
+        # config may be in cwd, or in a file referenced by env var, to be consistent with
+        # other AquaINFRA processes.
+        config_file_path = os.environ.get('PYOWT_CONFIG_FILE', "./config.json")
+        with open(config_file_path, 'r') as config_file:
+            config = json.load(config_file)
+            path_sensor_band_library = config['pyowt']['path_sensor_band_library']
+
+    return path_sensor_band_library
+
+
+# Read-only record of the band setup of one sensor, shared by all `OpticalVariables` instances:
+#   the nominal bands for AVW, the RGB bands (by B, R, G order), the band range, and the
+#   coefficients of the polynomial from multi- to hyperspectral AVW (from degree 0 to 5).
+SensorProfile = namedtuple(
+    "SensorProfile",
+    ["name", "AVW_bands", "RGB_bands", "band_min", "band_max", "AVW_convert_coef"],
+)
+
+
+def _read_sensor_profiles(path):
+    # compile the profiles of all sensors from the band library and the regression coefficients
+    sensor_lib = _load_once(path, _read_yaml)['lib_800']
+    proj_root = os.path.dirname(os.path.abspath(__file__))
+    d = read_csv(os.path.join(proj_root, sensor_lib['AVW_regression_coef']))
+    coefs = {row[0]: tuple(row[1:]) for row in d[["sensor", "0", "1", "2", "3", "4", "5"]].values.tolist()}
+
+    profiles = {}
+    for name, AVW_bands in sensor_lib['sensor_AVW_bands_library'].items():
+        profiles[name] = SensorProfile(
+            name=name,
+            AVW_bands=tuple(AVW_bands),
+            RGB_bands=tuple(sensor_lib['sensor_RGB_bands_library'][name]),
+            band_min=sensor_lib['sensor_RGB_min_max'][name]["min"],
+            band_max=sensor_lib['sensor_RGB_min_max'][name]["max"],
+            AVW_convert_coef=coefs.get(name),
+        )
+    return MappingProxyType(profiles)
+
+
+def _read_sensor_library_views(path):
+    # read-only views of the band library by sensor (as in the YAML file), compiled from the profiles
+    profiles = _load_once(path, _read_sensor_profiles, key=('sensor_profiles', path))
+    return SimpleNamespace(
+        AVW_bands=MappingProxyType({name: p.AVW_bands for name, p in profiles.items()}),
+        RGB_bands=MappingProxyType({name: p.RGB_bands for name, p in profiles.items()}),
+        RGB_min_max=MappingProxyType({name: MappingProxyType({"min": p.band_min, "max": p.band_max}) 
+                                      for name, p in profiles.items()}),
+        AVW_regression_coef=_load_once(path, _read_yaml)['lib_800']['AVW_regression_coef'],
+    )
+
+
+def load_sensor_profiles():
+    """Profiles of all sensors in the band library, as a read-only mapping of name -> `SensorProfile`
+
+    The band library (sensor_band_library.yaml) and the regression coefficients of AVW are 
+    read and compiled once per process; all later calls (and all `OpticalVariables` instances)
+    share the cached profiles without touching the disk. The profiles are cached per path of the
+    band library, so a library given by `PYOWT_CONFIG_FILE` is compiled on its own.
+    """
+    path = _sensor_library_path()
+    return _load_once(path, _read_sensor_profiles, key=('sensor_profiles', path))
+
+
+def sensor_profile(sensor):
+    """The `SensorProfile` of `sensor`, see `load_sensor_profiles`
+    """
+    profiles = load_sensor_profiles()
+    if sensor not in profiles:
+        available_sensors = ', '.join(profiles.keys())
+        raise ValueError(f"The input `sensor` couldn't be found in the library: {available_sensors}")
+    return profiles[sensor]
+
+
+# Bands (and their indices in the input `band`) of AVW, Area, and NDI, resolved once per band layout
+#   and sensor; indices are slices if the bands are evenly spaced in `band`, so that Rrs is taken
+#   by views instead of copies. `AVW_interp` is True for hyperspectral bands not in 1 nm interval,
+#   which are linearly interpolated to `AVW_bands` (400 to 800 nm); AVW of the interpolated Rrs is
+#   then given by the weights of the numerator and denominator (`AVW_weights`) of the bands at
+#   `AVW_index`, without the interpolated Rrs.
+BandPlan = namedtuple(
+    "BandPlan",
+    ["sensor", "AVW_index", "AVW_bands", "AVW_interp", "AVW_weights", "RGB_bands", "Area_index", "Area_bands",
+     "NDI_index"],
+)
+
+_BAND_PLAN_CACHE = {}
+_BAND_PLAN_LOCK = threading.Lock()
+
+
+def _as_index(idx):
+    # a slice for evenly spaced (increasing) indices, otherwise the index array
+    idx = np.asarray(idx, dtype=np.intp)
+    if idx.size == 1 or (idx.size > 1 and np.all(np.diff(idx) == idx[1] - idx[0]) and idx[1] > idx[0]):
+        step = 1 if idx.size == 1 else int(idx[1] - idx[0])
+        return slice(int(idx[0]), int(idx[-1]) + 1, step)
+    return idx
+
+
+def _build_band_plan(band, sensor):
+    def nearest(v):
+        return int(np.argmin(abs(band - v)))
+
+    if sensor is None:
+        ref_RGB_bands = [443, 560, 665]
+        AVW_interp = not np.all(np.diff(band) == 1)
+        AVW_index = slice(None)
+        AVW_bands = np.arange(400, 801, 1) if AVW_interp else band
+        AVW_weights = None
+
+        if AVW_interp:
+            # AVW = sum(R) / sum(R / wavelength) of the interpolated R is a ratio of two linear functions 
+            #   of Rrs, as the linear interpolation (R = Rrs @ W, with W interpolated from the identity),
+            #   so the interpolation is folded into two weights per band: W.sum(1) and W @ (1 / wavelength)
+            W = interp1d(band, np.eye(band.size), kind='linear', axis=-1,
+                         bounds_error=False, fill_value='extrapolate')(AVW_bands)
+            w_num, w_den = W.sum(axis=-1), W @ (1 / AVW_bands)
+            # only the bands next to 400 to 800 nm are taken
+            used = np.flatnonzero((w_num != 0) | (w_den != 0))
+            AVW_index = _as_index(used)
+            AVW_weights = (w_num[used], w_den[used])
+    else:
+        profile = sensor_profile(sensor)
+        ref_RGB_bands = profile.RGB_bands
+        AVW_interp = False
+        AVW_weights = None
+        # nearest band of each AVW band of the sensor (duplicates kept)
+        idx = [nearest(v) for v in profile.AVW_bands]
+        AVW_index = _as_index(idx)
+        AVW_bands = np.array([band[i].item() for i in idx])
+
+    RGB_bands = tuple(band[nearest(v)] for v in ref_RGB_bands)
+    Area_index = _as_index(np.where(np.isin(band, RGB_bands))[0])
+    NDI_index = tuple(int(np.where(band == v)[0][0]) for v in RGB_bands)
+
+    Area_bands = np.array(RGB_bands)
+    for arr in (AVW_bands, Area_bands) + (AVW_weights or ()):
+        arr.setflags(write=False)
+
+    return BandPlan(sensor=sensor, AVW_index=AVW_index, AVW_bands=AVW_bands, AVW_interp=AVW_interp,
+                    AVW_weights=AVW_weights, RGB_bands=RGB_bands, Area_index=Area_index, Area_bands=Area_bands,
+                    NDI_index=NDI_index)
+
+
+def band_plan(band, sensor=None):
+    """Band indices of AVW, Area, and NDI for the wavelengths `band` of a sensor (None for hyperspectral)
+
+    The nearest bands of the sensor profile are resolved once per process for each band layout,
+    so that `OpticalVariables` on many tiles of the same sensor skips the matching. 
+
+    Args:
+        band (list): wavelengths of Rrs bands
+        sensor (str, optional): sensor name in the band library. None for hyperspectral Rrs.
+
+    Returns:
+        BandPlan: the resolved bands and indices (read-only, shared by all callers)
+    """
+    band = np.array(band)
+    key = (band.dtype.str, band.shape, band.tobytes(), sensor)
+    plan = _BAND_PLAN_CACHE.get(key)
+    if plan is not None:
+        return plan
+
+    with _BAND_PLAN_LOCK:
+        plan = _BAND_PLAN_CACHE.get(key)
+        if plan is None:
+            band.setflags(write=False)
+            plan = _build_band_plan(band, sensor)
+            _BAND_PLAN_CACHE[key] = plan
+
+    return plan
+
+
 class OpticalVariables():
 
-    def __init__(self, Rrs, band, sensor=None, version='v01'):
+    def __init__(self, Rrs, band, sensor=None, version='v01', skip_invalid=False, dtype=None, band_axis=None,
+                 min_bands=None):
+        """Calculate three optical variables (AVW, Area, and NDI) from Rrs
+
+        Args:
+            Rrs (np.ndarray): remote sensing reflectance, see below for the supported shapes
+            band (list): wavelengths of Rrs bands
+            sensor (str, optional): sensor name in the band library. None for hyperspectral Rrs.
+            version (str): Version of the classification centroids. Default as 'v01'.
+            skip_invalid (bool): only calculate for pixels with at least one non-NaN band and 
+                fill others with NaN (as they'd get anyway), which saves time for mostly NaN 
+                satellite scenes. The mask is kept as `valid`. Default as False.
+            dtype (np.dtype, optional): floating type of the calculation and outputs, e.g., np.float32
+                to halve the memory for float32 satellite Rrs. The AVW conversion from multi- to 
+                hyperspectral is always done in float64. Default as None (float64 for most inputs).
+            band_axis (int, optional): axis of `Rrs` for wavelength. If given, `Rrs` can have any 
+                number of dims and AVW, Area, and NDI come back in the shape of the other dims,
+                e.g., (time, lat, lon) for (wavelen, time, lat, lon) Rrs with `band_axis=0`. 
+                The band axis is only moved by a view, so no copy of the whole Rrs is made. 
+                Default as None for the legacy shapes of 1-4 dims below.
+            min_bands (int, optional): calculate AVW from the non-NaN bands of each pixel (NaN bands are 
+                left out of both sums), if at least `min_bands` of the bands for AVW are valid, instead of 
+                NaN for a single NaN band (e.g., negative Rrs set to NaN). The number of bands used per 
+                pixel is kept as `AVW_n_bands`, and the number of pixels with NaN bands but a valid AVW 
+                as `AVW_recovered`. A warning is given for multispectral sensors, as their AVW conversion 
+                is fitted to all of their bands. Default as None (NaN if any band is NaN).
+        """
 
         if not isinstance(Rrs, np.ndarray):
 
             raise TypeError("Input 'Rrs' should be np.ndarray type.")        
 
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        if self.dtype is not None:
+            Rrs = Rrs.astype(self.dtype, copy=False)
+
         # manipulate dimension of input Rrs as we always assume it is 3d nparray (raster-like)
         #   the wavelength should be on the shape[2] dim
+        #   unless `band_axis` is given, where the wavelength is only moved to the last dim
 
-        if np.ndim(Rrs) == 1:
+        if band_axis is not None:
+            self.Rrs = np.moveaxis(Rrs, band_axis, -1)
+            self.original_shape = self.Rrs.shape[:-1]
+        elif np.ndim(Rrs) == 1:
             # here assume a signle spectrum
             self.Rrs = Rrs.reshape(1, 1, Rrs.shape[0])
         elif np.ndim(Rrs) == 2:
@@ -42,30 +287,23 @@ class OpticalVariables():
         self.Area = None
         self.NDI = None
 
-        # TODO: check the input band fits the selected sensor range
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        data_dir = os.path.join(base_dir, 'data')
-        path_sensor_band_library = os.path.join(data_dir, 'sensor_band_library.yaml')
-
-        if not os.path.isfile(path_sensor_band_library):
-            # we're obviously in a different env with a different cwd, so read path from config
-            # config may be in cwd, or in a file referenced by env var, to be consistent with
-            # other AquaINFRA processes.
-            config_file_path = os.environ.get('PYOWT_CONFIG_FILE', "./config.json")
-            with open(config_file_path, 'r') as config_file:
-                config = json.load(config_file)
-                path_sensor_band_library = config['pyowt']['path_sensor_band_library']
-
+        if min_bands is not None and min_bands < 1:
+            raise ValueError(f"`min_bands` should be at least 1, got {min_bands}")
+        self.min_bands = min_bands
 
-        with open(path_sensor_band_library, 'r') as file:
-            sensor_lib = yaml.load(file, Loader=yaml.FullLoader)
+        # TODO: check the input band fits the selected sensor range
+        path_sensor_band_library = _sensor_library_path()
 
+        # compiled once per process and shared by all instances, so they are read-only 
+        #   (mappings of tuples)
+        sensor_lib = _load_once(path_sensor_band_library, _read_sensor_library_views, 
+                                key=('sensor_library_views', path_sensor_band_library))
 
-        self.sensor_AVW_bands_library = sensor_lib['lib_800']['sensor_AVW_bands_library']
-        self.sensor_RGB_bands_library = sensor_lib['lib_800']['sensor_RGB_bands_library']
+        self.sensor_AVW_bands_library = sensor_lib.AVW_bands
+        self.sensor_RGB_bands_library = sensor_lib.RGB_bands
         # dont_TODO: if AVW ends by 700 nm, this list has to be modified
-        self.sensor_RGB_min_max = sensor_lib['lib_800']['sensor_RGB_min_max']
-        self.AVW_regression_coef = sensor_lib['lib_800']['AVW_regression_coef']
+        self.sensor_RGB_min_max = sensor_lib.RGB_min_max
+        self.AVW_regression_coef = sensor_lib.AVW_regression_coef
         
         self.available_sensors = ', '.join(self.sensor_AVW_bands_library.keys())
 
@@ -73,8 +311,7 @@ class OpticalVariables():
             
             # the input Rrs are assumed to be hyperspectral
             self.spectral_attr = "hyper"
-            ref_sensor_RGB_bands = [443, 560, 665]
-            self.sensor_RGB_bands = [self.band[np.argmin(abs(self.band - v))] for v in ref_sensor_RGB_bands]
+            self.sensor_profile = None
             self.sensor_band_min = 400
             self.sensor_band_max = 800
             self.AVW_conver_coef = [0, 1, 0, 0, 0, 0]
@@ -86,33 +323,42 @@ class OpticalVariables():
                     )
 
         else:
-            
-            if self.sensor not in self.sensor_AVW_bands_library.keys():
-                
-                raise ValueError(f"The input `sensor` couldn't be found in the library: {self.available_sensors}")
+
+            # compiled once per process, see `load_sensor_profiles`
+            self.sensor_profile = sensor_profile(self.sensor)
 
             # if `sensor` specifized, trigger `conver_AVW_multi_to_hyper` 
             self.spectral_attr = "multi"
 
-            # define RGB bands, by B, R, G order
-            ref_sensor_RGB_bands = self.sensor_RGB_bands_library[self.sensor]
-            self.sensor_RGB_bands = [self.band[np.argmin(abs(self.band - v))] for v in ref_sensor_RGB_bands]
-
             # define min max ranges 
-            self.sensor_band_min = self.sensor_RGB_min_max[self.sensor]["min"]
-            self.sensor_band_max = self.sensor_RGB_min_max[self.sensor]["max"]
+            self.sensor_band_min = self.sensor_profile.band_min
+            self.sensor_band_max = self.sensor_profile.band_max
 
-            # read coefficients to convert AVW_multi to AVW_hyper
-            proj_root = os.path.dirname(os.path.abspath(__file__))
-            fn = os.path.join(proj_root, self.AVW_regression_coef)
-            d = read_csv(fn)
-            self.AVW_convert_coef = d[d["sensor"] == sensor][["0", "1", "2", "3", "4", "5"]].values.tolist()[0]
+            # coefficients to convert AVW_multi to AVW_hyper
+            self.AVW_convert_coef = list(self.sensor_profile.AVW_convert_coef)
 
+            if self.min_bands is not None:
+                import warnings
+                warnings.warn(
+                    f"`min_bands` is meant for hyperspectral Rrs. The AVW conversion of '{self.sensor}' "
+                    "is fitted to all of its bands, so AVW from fewer bands may be biased.",
+                    UserWarning,
+                    stacklevel=2
+                )
+
+        # bands of AVW, Area, and NDI (RGB bands, by B, R, G order), resolved once per band layout
+        self.band_plan = band_plan(self.band, self.sensor)
+        self.sensor_RGB_bands = list(self.band_plan.RGB_bands)
 
         # run calculation
-        self.calculate_AVW()
-        self.calculate_Area()
-        self.calculate_NDI()
+        self.skip_invalid = skip_invalid
+
+        if self.skip_invalid:
+            self.calculate_valid_only()
+        else:
+            self.calculate_AVW()
+            self.calculate_Area()
+            self.calculate_NDI()
 
     class ArrayWithAttributes:
         '''This subclass add attributes to np.array
@@ -150,40 +396,51 @@ class OpticalVariables():
             return self.array
 
 
+    def _as_dtype(self, arr):
+        # cast to the calculation dtype if specified
+        return arr if self.dtype is None else np.asarray(arr, dtype=self.dtype)
+
+
     def convert_AVW_multi_to_hyper(self):
-        self.AVW_hyper = np.zeros(self.AVW_multi.shape)
+        # always in float64 since AVW_multi**5 is about 1e13
+        AVW_multi = np.asarray(self.AVW_multi, dtype=np.float64)
+        self.AVW_hyper = np.zeros(AVW_multi.shape)
         for i in range(len(self.AVW_convert_coef)):
-            self.AVW_hyper += self.AVW_convert_coef[i] * (self.AVW_multi**i)
+            self.AVW_hyper += self.AVW_convert_coef[i] * (AVW_multi**i)
+        self.AVW_hyper = self._as_dtype(self.AVW_hyper)
 
 
     def calculate_AVW(self):
         # idx_for_AVW = (self.band >= self.sensor_band_min) & (self.band <= self.sensor_band_max)
         # bands_for_AVW = self.band[idx_for_AVW]
-        if self.spectral_attr == "hyper":
-            bands_for_AVW = self.band
-            Rrs_for_AVW = self.Rrs
-
-            # check if is 1 nm interval from 400 to 800 nm
-            target_bands = np.arange(self.sensor_band_min, self.sensor_band_max + 1, 1)
-            is_1nm_interval = np.all(np.diff(bands_for_AVW) == 1)
-
-            if not is_1nm_interval:
-                X, Y, _ = Rrs_for_AVW.shape
-                Rrs_new = np.zeros((X, Y, len(target_bands)))
-                interp_func = interp1d(bands_for_AVW, Rrs_for_AVW, kind='linear', axis=-1, 
-                                       bounds_error=False, fill_value='extrapolate')
-                Rrs_new = interp_func(target_bands)
-                
-                bands_for_AVW = target_bands
-                Rrs_for_AVW = Rrs_new
-
-        else:
-            bands_for_AVW = [self.band[np.argmin(abs(self.band - v))].item() for v in self.sensor_AVW_bands_library[self.sensor]]
-            bands_for_AVW = np.array(bands_for_AVW)
-            idx_for_AVW = [np.where(self.band == band)[0][0].item() for band in bands_for_AVW if band in self.band]
-            Rrs_for_AVW = self.Rrs[:, :, idx_for_AVW]
-
-        self.AVW_init = np.sum(Rrs_for_AVW, axis=-1) / np.sum(Rrs_for_AVW / bands_for_AVW[None, None, :], axis=-1)
+        plan = self.band_plan
+        Rrs_for_AVW = self.Rrs[..., plan.AVW_index]
+
+        if self.min_bands is not None:
+            # NaN bands are counted and set to 0 in one pass, so that they're left out of both sums
+            missing = np.isnan(Rrs_for_AVW)
+            n_bands_all = Rrs_for_AVW.shape[-1]
+            self.AVW_n_bands = n_bands_all - np.count_nonzero(missing, axis=-1)
+            Rrs_for_AVW = np.where(missing, 0, Rrs_for_AVW)
+
+        # 0 / 0 of pixels without valid bands is expected with `min_bands` (set to NaN below)
+        with np.errstate(**({'invalid': 'ignore', 'divide': 'ignore'} if self.min_bands is not None else {})):
+            if plan.AVW_interp:
+                # hyperspectral Rrs not in 1 nm interval, as if interpolated to 1 nm from 400 to 800 nm
+                #   (see `band_plan`), without allocating the interpolated Rrs. Summed as the other AVW 
+                #   (not by a matrix product), so that the results don't depend on the chunks of spectra
+                w_num, w_den = [self._as_dtype(w) for w in plan.AVW_weights]
+                self.AVW_init = np.sum(Rrs_for_AVW * w_num, axis=-1) / np.sum(Rrs_for_AVW * w_den, axis=-1)
+            else:
+                bands_for_AVW = self._as_dtype(plan.AVW_bands)
+                self.AVW_init = np.sum(Rrs_for_AVW, axis=-1) / np.sum(Rrs_for_AVW / bands_for_AVW, axis=-1)
+        self.AVW_init = self._as_dtype(self.AVW_init)
+
+        if self.min_bands is not None:
+            # pixels with too few bands (also 0 / 0 of those without any) are NaN
+            too_few = self.AVW_n_bands < self.min_bands
+            self.AVW_init = np.where(too_few, np.nan, self.AVW_init)
+            self.AVW_recovered = int(np.count_nonzero(~too_few & (self.AVW_n_bands < n_bands_all)))
 
         if self.spectral_attr == "hyper":
             self.AVW_hyper = self.AVW_init
@@ -195,23 +452,51 @@ class OpticalVariables():
 
 
     def calculate_Area(self):
-        bands_for_Area = np.array(self.sensor_RGB_bands)
-        Rrs_for_Area = self.Rrs[:, :, np.where(np.isin(self.band, bands_for_Area))[0]]
-        self.Area = np.trapz(x=bands_for_Area, y=Rrs_for_Area, axis=-1)
+        bands_for_Area = self.band_plan.Area_bands
+        Rrs_for_Area = self.Rrs[..., self.band_plan.Area_index]
+        self.Area = np.trapz(x=self._as_dtype(bands_for_Area), y=Rrs_for_Area, axis=-1)
 
 
     def calculate_NDI(self):
-        r_blue = self.Rrs[:, :, np.where(np.isin(self.band, self.sensor_RGB_bands[0]))[0]]
-        r_green = self.Rrs[:, :, np.where(np.isin(self.band, self.sensor_RGB_bands[1]))[0]]
-        r_red = self.Rrs[:, :, np.where(np.isin(self.band, self.sensor_RGB_bands[2]))[0]]
+        # single bands by integer indices, i.e., views of Rrs
+        r_blue, r_green, r_red = [self.Rrs[..., i] for i in self.band_plan.NDI_index]
 
         if self.version == 'v99':
             r_1 = np.maximum(r_blue, r_green)
         else:
             r_1 = r_green
 
-        NDI = (r_1 - r_red) / (r_1 + r_red)
-        self.NDI = NDI[:, :, 0]
+        self.NDI = (r_1 - r_red) / (r_1 + r_red)
+
+
+    def calculate_valid_only(self):
+        """Calculate AVW, Area, and NDI only for pixels that are not all NaN
+
+        The valid pixels are packed into a (N, bands) array for the calculation and 
+        the results are scattered back to the raster shape, filled with NaN elsewhere.
+        """
+        Rrs_full = self.Rrs
+        self.valid = ~np.all(np.isnan(Rrs_full), axis=-1)
+
+        try:
+            self.Rrs = Rrs_full[self.valid]
+            self.calculate_AVW()
+            self.calculate_Area()
+            self.calculate_NDI()
+        finally:
+            self.Rrs = Rrs_full
+
+        # scatter each result once, keeping the aliases (e.g., AVW is AVW_hyper)
+        scattered = {}
+        for name in ['AVW_init', 'AVW_multi', 'AVW_hyper', 'AVW', 'Area', 'NDI', 'AVW_n_bands']:
+            arr = getattr(self, name, None)
+            if arr is None:
+                continue
+            if id(arr) not in scattered:
+                full = np.full(self.valid.shape, 0 if name == 'AVW_n_bands' else np.nan, dtype=arr.dtype)
+                full[self.valid] = arr
+                scattered[id(arr)] = full
+            setattr(self, name, scattered[id(arr)])
 
 
     def run(self):
@@ -230,6 +515,7 @@ class OpticalVariables():
         self.calculate_NDI()
 
     def shape_reverse(self, arr):
+        # back to (time, lat, lon) for 4d inputs, or to the caller's shape if `band_axis` is given
         if hasattr(self, 'original_shape'):
             arr = arr.reshape(self.original_shape)
             return arr
@@ -0,0 +1,441 @@
+import numpy as np
+from types import SimpleNamespace
+
+from pyowt.OpticalVariables import OpticalVariables, band_plan
+from pyowt.OWT import (BLOCK_SIZE, DISTANCE_CUTOFF, classify, load_centroids, _classify_blocks, _map_blocks,
+                       _mask_rows, _resolve_workers)
+
+
+# outputs of `classify_rrs`
+OUTPUTS = ('AVW', 'Area', 'NDI', 'ABC', 'u', 'utot', 'type_idx', 'classifiability')
+
+# number of spectra per chunk of `classify_rrs` with selected `outputs` (unless set by `max_memory`)
+CHUNK_SIZE = 16 * BLOCK_SIZE
+
+
+def _working_bytes_per_spectrum(n_band, itemsize, min_bands=None):
+    # peak bytes of the temporaries of `OpticalVariables` per spectrum (measured by tracemalloc 
+    #   and rounded up), where all bands are taken for AVW and Area as an upper bound
+    if min_bands is not None:
+        # the mask of NaN bands and the Rrs with NaN set to 0, besides the division below
+        return 2 * n_band * itemsize + n_band + 64
+    # the division of Rrs by the bands for AVW (Area and NDI only take three bands); hyperspectral
+    #   Rrs not at 1 nm take less, as their AVW is given by weights without the interpolated Rrs
+    return n_band * itemsize + 64
+
+
+def estimate_memory(Rrs, band, sensor=None, version='v01', dtype=None, band_axis=-1, n_workers=None, 
+                    max_memory=None, outputs=None, min_bands=None):
+    """Estimate the memory of `classify_rrs` without running it (a dry run)
+
+    The memory of a run is split into a fixed part, which grows with the number of pixels
+    (the outputs, the mask and index of valid pixels), and a working set per spectrum 
+    (the gathered Rrs and the temporaries of `OpticalVariables`), which is bounded by running
+    on chunks of spectra.
+    The temporaries of the classification are per block and don't grow with the pixels.
+
+    The input Rrs are held by the caller and are not counted. Invalid pixels are counted 
+    as valid, so the estimate is an upper bound for `skip_invalid`.
+
+    Args:
+        Rrs (np.ndarray or tuple): Rrs, or its shape (taken as float64) for a dry run without data
+        band (list): wavelengths of Rrs bands
+        sensor (str, optional): sensor name in the band library. None for hyperspectral Rrs.
+        version (str): Version of the classification centroids. Default as 'v01'.
+        dtype (np.dtype, optional): floating type of the calculation and outputs, see `classify_rrs`
+        band_axis (int): axis of `Rrs` for wavelength. Default as -1 (the last dim).
+        n_workers (int, optional): number of threads, see `classify_rrs`
+        max_memory (int, optional): memory budget in bytes to find the chunk size for
+        outputs (list, optional): outputs kept, see `classify_rrs`. Default as None (all).
+        min_bands (int, optional): see `classify_rrs`. Default as None.
+
+    Returns:
+        dict: n_pixels, n_bands, fixed_bytes, bytes_per_spectrum (the working set), peak_bytes
+            (without a budget), and, for `max_memory`, chunk_size (spectra per chunk, None if not
+            chunked) and peak_bytes_chunked
+
+    Examples:
+
+        est = estimate_memory((4865, 4091, 21), band, sensor='olci-s3a', max_memory=8 * 2**30)
+        print(est['peak_bytes'] / 2**30, est['chunk_size'])
+    """
+    if isinstance(Rrs, tuple):
+        shape_in, dtype_in = Rrs, np.dtype(np.float64)
+    else:
+        shape_in, dtype_in = np.shape(Rrs), np.asarray(Rrs).dtype
+    if dtype_in.kind != 'f':
+        dtype_in = np.dtype(np.float64)
+
+    band_axis = band_axis % len(shape_in)
+    n_band = shape_in[band_axis]
+    n_pixels = int(np.prod(shape_in)) // max(n_band, 1)
+    itemsize_in = dtype_in.itemsize
+    itemsize = np.dtype(dtype_in if dtype is None else dtype).itemsize  # of AVW, Area, and NDI
+    itemsize_out = np.dtype(np.float64 if dtype is None else dtype).itemsize  # of ABC, u, and utot
+    typeNumb = load_centroids(version).typeNumb
+
+    output_bytes = {'AVW': itemsize, 'Area': itemsize, 'NDI': itemsize, 'ABC': itemsize_out, 
+                    'u': typeNumb * itemsize_out, 'utot': itemsize_out, 'type_idx': 1, 'classifiability': 8}
+
+    # gathered Rrs (and a cast copy), temporaries, and outputs of `OpticalVariables`
+    bytes_per_spectrum = (n_band * itemsize_in + (n_band * itemsize if itemsize != itemsize_in else 0) + 
+                          _working_bytes_per_spectrum(n_band, itemsize, min_bands) + 
+                          3 * 8 + 3 * itemsize)
+
+    if outputs is None:
+        # all outputs and the valid mask; the index of valid pixels twice (here and in `classify_into`), 
+        #   the invalid mask, and float64 copies of AVW, Area, and NDI if they are not float64
+        fixed_per_pixel = sum(output_bytes.values()) + 1 + 2 * 8 + 1 + (3 * 8 if itemsize != 8 else 0)
+    else:
+        # the selected outputs, the valid mask, its index, and the flags of rows; AVW, Area, and NDI
+        #   (in float64), the index, and the outputs of the classification (at least utot) are per chunk
+        fixed_per_pixel = sum(output_bytes[name] for name in outputs) + 1 + 8 + 1
+        bytes_per_spectrum += 3 * 8 + 8 + sum(output_bytes[name] for name in set(outputs) | {'utot'} 
+                                              if name not in ('AVW', 'Area', 'NDI'))
+    fixed_bytes = n_pixels * fixed_per_pixel
+    # feature, distance, and output buffers of the blocks in progress, one per thread
+    fixed_bytes += _resolve_workers(n_workers) * min(BLOCK_SIZE, n_pixels) * (3 + 6 * typeNumb) * 8
+    # small arrays of any run (e.g., the band plan and the steps of a few spectra), measured as above
+    fixed_bytes += 2**16
+
+    estimate = {
+        "n_pixels": n_pixels,
+        "n_bands": n_band,
+        "fixed_bytes": fixed_bytes,
+        "bytes_per_spectrum": bytes_per_spectrum,
+        # with selected outputs, the run is always chunked
+        "peak_bytes": fixed_bytes + min(n_pixels, n_pixels if outputs is None else CHUNK_SIZE) * bytes_per_spectrum,
+    }
+
+    if max_memory is not None:
+        if estimate["peak_bytes"] <= max_memory:
+            chunk_size = None
+        else:
+            chunk_size = int((max_memory - fixed_bytes) // bytes_per_spectrum)
+            if chunk_size < 1:
+                raise ValueError(f"`max_memory` of {max_memory / 2**20:.3g} MB is too small, the outputs and "
+                                 f"one spectrum per chunk take {(fixed_bytes + bytes_per_spectrum) / 2**20:.3g} MB")
+        estimate["chunk_size"] = chunk_size
+        estimate["peak_bytes_chunked"] = fixed_bytes + min(n_pixels, chunk_size or n_pixels) * bytes_per_spectrum
+
+    return estimate
+
+
+def _optical_variables_chunked(Rrs, valid, chunk_size, band, sensor, version, dtype, n_workers=None, 
+                               min_bands=None):
+    # AVW, Area, and NDI of the `valid` pixels of Rrs (wavelength on the last dim) in the raster 
+    #   shape, gathered and calculated by chunks of `chunk_size` spectra (NaN for others), and
+    #   the number of pixels with AVW recovered by `min_bands`
+    shape = Rrs.shape[:-1]
+    index = np.flatnonzero(valid)
+    variables = {}
+    recovered = 0
+    for start in range(0, index.size, chunk_size):
+        idx = index[start:start + chunk_size]
+        packed, n = _optical_variables(Rrs[np.unravel_index(idx, shape)], band, sensor, version, dtype, n_workers, 
+                                       min_bands)
+        recovered += n
+        for name, arr in packed.items():
+            if name not in variables:
+                variables[name] = np.full(shape, np.nan, dtype=arr.dtype)
+            variables[name].reshape(-1)[idx] = arr
+    if not variables:
+        variables = {name: np.full(shape, np.nan, dtype=dtype) for name in ['AVW', 'Area', 'NDI']}
+    return variables, recovered
+
+
+def _optical_variables(Rrs, band, sensor, version, dtype, n_workers=None, min_bands=None):
+    # AVW, Area, and NDI of Rrs (wavelength on the last dim), for row blocks of the flattened 
+    #   spectra on a thread pool if `n_workers` > 1 (spectra are independent, so the results
+    #   are the same as of one `OpticalVariables` for all), and the sum of `AVW_recovered`
+    if _resolve_workers(n_workers) <= 1 or Rrs.ndim < 2:
+        ov = OpticalVariables(Rrs=Rrs, band=band, sensor=sensor, version=version, dtype=dtype, band_axis=-1, 
+                              min_bands=min_bands)
+        return {'AVW': ov.AVW, 'Area': ov.Area, 'NDI': ov.NDI}, getattr(ov, 'AVW_recovered', 0)
+
+    shape = Rrs.shape[:-1]
+    Rrs_ = Rrs.reshape(-1, Rrs.shape[-1])
+    variables = {}
+    recovered = []
+
+    def run_block(start, stop):
+        ov = OpticalVariables(Rrs=Rrs_[start:stop], band=band, sensor=sensor, version=version, dtype=dtype,
+                              band_axis=-1, min_bands=min_bands)
+        for name in ['AVW', 'Area', 'NDI']:
+            arr = getattr(ov, name)
+            if name not in variables:
+                # (setdefault is atomic, so the first block of any thread allocates the output)
+                variables.setdefault(name, np.empty(Rrs_.shape[0], dtype=arr.dtype))
+            variables[name][start:stop] = arr
+        recovered.append(getattr(ov, 'AVW_recovered', 0))
+
+    _map_blocks(run_block, Rrs_.shape[0], BLOCK_SIZE, n_workers)
+    return {name: arr.reshape(shape) for name, arr in variables.items()}, sum(recovered)
+
+
+def classify_rrs(Rrs, band, sensor=None, version='v01', thres_u=0.0001, skip_invalid=True, dtype=None,
+                 band_axis=-1, n_workers=None, backend='thread', max_memory=None, outputs=None, min_bands=None):
+    """Run the whole chain from Rrs to OWT (OpticalVariables -> OWT) in one call
+
+    With `skip_invalid`, the index of valid pixels (at least one non-NaN band) is built once,
+    and the chain only runs on these pixels, packed as a 1-d list of spectra. The results
+    are scattered back to the raster shape, where invalid pixels get NaN for AVW, Area, NDI,
+    u, and utot, -1 for type_idx, and 0 for classifiability (as they'd get anyway).
+    Satellite scenes are often mostly land, cloud, or flagged pixels, so this saves
+    nearly proportional time.
+
+    Args:
+        Rrs (np.ndarray): remote sensing reflectance with wavelength on the `band_axis` dim,
+            e.g., (rows, cols, bands), (samples, bands), or (bands, time, lat, lon)
+        band (list): wavelengths of Rrs bands
+        sensor (str, optional): sensor name in the band library. None for hyperspectral Rrs.
+        version (str): Version of the classification centroids. Default as 'v01'.
+        thres_u (numeric): the threshold of membership (u) to mask out non-classifiable inputs.
+        skip_invalid (bool): only run on valid pixels. Default as True.
+        dtype (np.dtype, optional): floating type of the calculation and outputs, e.g., np.float32,
+            see `OpticalVariables` and `classify_into`. Default as None (float64).
+        band_axis (int): axis of `Rrs` for wavelength. Default as -1 (the last dim).
+        n_workers (int, optional): number of threads to run both steps on, by blocks of spectra, 
+            -1 for all CPUs. The results are identical to those of a single thread. 
+            Default as None (one thread).
+        backend (str): 'thread' or 'process' to run on `n_workers` processes instead, with Rrs and 
+            the outputs in shared memory (see `pyowt.ProcessPool.classify_rrs_processes`), for the 
+            parts that hold the GIL (e.g., the per-call overhead of `OpticalVariables` on small blocks). 
+            The results are the same. Default as 'thread'.
+        max_memory (int, optional): memory budget of the run in bytes (besides the input Rrs).
+            If the estimate of `estimate_memory` is above it, OpticalVariables is run on chunks 
+            of spectra sized to keep the peak below the budget, with the same results. A ValueError
+            is raised if even one spectrum per chunk doesn't fit (e.g., for a single 1-d spectrum). 
+            Only for the thread backend: with `backend='process'` on more than one worker, the 
+            outputs are in shared memory of the raster size and a ValueError is raised. 
+            Default as None (not limited).
+        outputs (list, optional): outputs to keep, from 'AVW', 'Area', 'NDI', 'ABC', 'u', 'utot', 
+            'type_idx', and 'classifiability', e.g., ['type_idx']. The others are never allocated 
+            for the whole raster: both steps run together on chunks of spectra, so only the 
+            memberships of a block and AVW, Area, and NDI of a chunk are kept in progress. 
+            Only for the thread backend. Default as None (all).
+        min_bands (int, optional): calculate AVW from the non-NaN bands of pixels with at least 
+            `min_bands` valid bands for AVW, see `OpticalVariables`. Default as None.
+
+    Returns:
+        SimpleNamespace: AVW, Area, NDI, ABC, u, utot, type_idx, classifiability (of the shape
+            of Rrs without `band_axis`, and u with an extra last dim for types), or those in 
+            `outputs`, and the `valid` mask; with `min_bands`, also `AVW_recovered`, the number 
+            of pixels with NaN bands but a valid AVW (summed over all blocks, chunks, or workers)
+    """
+    if backend not in ('thread', 'process'):
+        raise ValueError(f"`backend` should be 'thread' or 'process', got '{backend}'")
+    if outputs is not None:
+        unknown = set(outputs) - set(OUTPUTS)
+        if unknown:
+            raise ValueError(f"Unknown outputs {sorted(unknown)}, should be from {list(OUTPUTS)}")
+
+    # a view with wavelength on the last dim
+    Rrs = np.moveaxis(np.asarray(Rrs), band_axis, -1)
+    shape = Rrs.shape[:-1]
+    names = ['AVW', 'Area', 'NDI']
+
+    if backend == 'process' and _resolve_workers(n_workers) > 1 and Rrs.ndim >= 2:
+        if max_memory is not None or outputs is not None:
+            raise ValueError("`max_memory` and `outputs` are only supported by the thread backend")
+        return _classify_rrs_processes(Rrs, band, sensor, version, thres_u, skip_invalid, dtype, 
+                                       _resolve_workers(n_workers), min_bands)
+
+    # the number of pixels with AVW recovered by `min_bands` (kept only if it is given, as by `OpticalVariables`)
+    recovered = {} if min_bands is None else {'AVW_recovered': 0}
+
+    chunk_size = None
+    if max_memory is not None:
+        # (a single spectrum always fits in one chunk, otherwise `estimate_memory` raises)
+        chunk_size = estimate_memory(Rrs, band, sensor=sensor, version=version, dtype=dtype, 
+                                     n_workers=n_workers, max_memory=max_memory, outputs=outputs, 
+                                     min_bands=min_bands)["chunk_size"]
+        if Rrs.ndim < 2:
+            chunk_size = None
+
+    if outputs is not None and Rrs.ndim >= 2:
+        if skip_invalid:
+            valid = ~np.all(np.isnan(Rrs), axis=-1)
+        else:
+            valid = np.ones(shape, dtype=bool)
+        result, n = _classify_rrs_outputs(Rrs, valid, outputs, min(chunk_size or CHUNK_SIZE, CHUNK_SIZE), band, 
+                                          sensor, version, thres_u, dtype, n_workers, min_bands)
+        recovered = {name: n for name in recovered}
+        return SimpleNamespace(**result, valid=valid, **recovered)
+
+    if chunk_size is not None:
+        if skip_invalid:
+            valid = ~np.all(np.isnan(Rrs), axis=-1)
+        else:
+            valid = np.ones(shape, dtype=bool)
+        variables, n = _optical_variables_chunked(Rrs, valid, chunk_size, band, sensor, version, dtype, n_workers, 
+                                                  min_bands)
+    elif skip_invalid:
+        valid = ~np.all(np.isnan(Rrs), axis=-1)
+        Rrs_ = Rrs[valid]  # packed (N, bands) array of valid pixels
+        if Rrs_.shape[0] > 0:
+            packed, n = _optical_variables(Rrs_, band, sensor, version, dtype, n_workers, min_bands)
+        else:
+            packed, n = {name: np.empty(0, dtype=dtype) for name in names}, 0
+
+        variables = {}
+        for name, arr in packed.items():
+            variables[name] = np.full(shape, np.nan, dtype=arr.dtype)
+            variables[name][valid] = arr
+    else:
+        valid = np.ones(shape, dtype=bool)
+        variables, n = _optical_variables(Rrs, band, sensor, version, dtype, n_workers, min_bands)
+    recovered = {name: n for name in recovered}
+
+    # (samples, bands) inputs are classified per sample as `OWT` does for (samples, 1) inputs
+    result = classify(*[variables[name] for name in names], version=version, thres_u=thres_u, 
+                      valid=valid if skip_invalid else None, 
+                      dtype=np.float64 if dtype is None else dtype, n_workers=n_workers)
+
+    result = {**{name: np.reshape(arr, shape) for name, arr in variables.items()}, **vars(result)}
+    if outputs is not None:
+        result = {name: arr for name, arr in result.items() if name in outputs}
+    return SimpleNamespace(**result, valid=valid, **recovered)
+
+
+def iter_classify_rrs(batches, band, sensor=None, version='v01', thres_u=0.0001, skip_invalid=True, dtype=None,
+                      band_axis=-1, n_workers=None, outputs=None, min_bands=None):
+    """Run `classify_rrs` on an iterable of Rrs batches with the same bands, yielding the results per batch
+
+    For archives of spectra too large to be loaded at once (e.g., read by slices of a netCDF file
+    or by chunks of a csv file): only one batch and its results are held at a time, so the memory 
+    depends on the batch size, not on the number of spectra. The setup (the sensor profile, 
+    the band plan, and the centroids) is done once, when this function is called, so errors of 
+    `band`, `sensor`, or `version` are raised before the first batch is read.
+
+    The results of each batch are those of `classify_rrs` on it; batches of (samples, bands) are
+    classified per sample, so the results don't depend on how the spectra are split. With 
+    `min_bands`, each result has the `AVW_recovered` of its batch.
+
+    Args:
+        batches (iterable): Rrs batches (np.ndarray), each with wavelength on the `band_axis` dim
+        band (list): wavelengths of Rrs bands, the same for all batches
+        sensor, version, thres_u, skip_invalid, dtype, band_axis, n_workers, outputs, min_bands: see `classify_rrs`
+
+    Returns:
+        generator: SimpleNamespace per batch, see `classify_rrs`
+
+    Examples:
+
+        with xr.open_dataset(fn) as ds:
+            batches = (ds['Rrs'][i:i + 10000].values for i in range(0, ds.sizes['sample'], 10000))
+            for res in iter_classify_rrs(batches, band=ds['wavelen'].values):
+                type_idx.append(res.type_idx)
+    """
+    if outputs is not None:
+        unknown = set(outputs) - set(OUTPUTS)
+        if unknown:
+            raise ValueError(f"Unknown outputs {sorted(unknown)}, should be from {list(OUTPUTS)}")
+
+    # cached per process, and shared by the runs on all batches
+    band = np.asarray(band)
+    band_plan(band, sensor)
+    load_centroids(version)
+
+    return _iter_classify_rrs(batches, band, sensor, version, thres_u, skip_invalid, dtype, band_axis, 
+                              n_workers, outputs, min_bands)
+
+
+def _iter_classify_rrs(batches, band, sensor, version, thres_u, skip_invalid, dtype, band_axis, n_workers, outputs,
+                       min_bands):
+    for i, Rrs in enumerate(batches):
+        Rrs = np.asarray(Rrs)
+        if Rrs.shape[band_axis] != band.size:
+            raise ValueError(f"Batch {i} has {Rrs.shape[band_axis]} bands on axis {band_axis}, "
+                             f"but {band.size} wavelengths are given in `band`")
+        yield classify_rrs(Rrs, band, sensor=sensor, version=version, thres_u=thres_u, skip_invalid=skip_invalid,
+                           dtype=dtype, band_axis=band_axis, n_workers=n_workers, outputs=outputs, 
+                           min_bands=min_bands)
+
+
+def _classify_rrs_outputs(Rrs, valid, outputs, chunk_size, band, sensor, version, thres_u, dtype, n_workers, 
+                          min_bands=None):
+    # `classify_rrs` for the selected `outputs` only: OpticalVariables and the classification run 
+    #   together on chunks of valid spectra, and their results are scattered to the raster;
+    #   the row rule is applied by flags per row (of the shape as by `classify`) if utot is not kept.
+    #   Also returns the sum of `AVW_recovered` of the chunks
+    classInfo = load_centroids(version)
+    shape = Rrs.shape[:-1]
+    work_shape = shape + (1,) * max(0, 2 - len(shape))
+    row_len = max(work_shape[-1], 1)
+    float_dtype = np.float64 if dtype is None else dtype
+    names = ['AVW', 'Area', 'NDI']
+
+    # (shape per pixel, dtype, fill value of invalid pixels) of the outputs of the classification
+    layout = {'ABC': ((), float_dtype, np.nan), 'u': ((classInfo.typeNumb,), float_dtype, np.nan), 
+              'utot': ((), float_dtype, np.nan), 'type_idx': ((), np.int8, -1), 'classifiability': ((), np.int_, 0)}
+    result = {name: np.full((valid.size,) + layout[name][0], layout[name][2], dtype=layout[name][1]) 
+              for name in layout if name in outputs}
+
+    # rows with any utot above the threshold, where utot of invalid pixels is NaN
+    row_keep = None
+    if 'utot' not in outputs:
+        row_keep = np.zeros(valid.size // row_len, dtype=bool)
+        row_keep[np.flatnonzero(~valid.reshape(-1)) // row_len] = True
+
+    index = np.flatnonzero(valid)
+    recovered = 0
+    for start in range(0, index.size, chunk_size):
+        idx = index[start:start + chunk_size]
+        packed, n = _optical_variables(Rrs[np.unravel_index(idx, shape)], band, sensor, version, dtype, n_workers, 
+                                       min_bands)
+        recovered += n
+        for name in names:
+            if name in outputs:
+                if name not in result:
+                    result[name] = np.full(valid.size, np.nan, dtype=packed[name].dtype)
+                result[name][idx] = packed[name]
+
+        # as `classify`, which takes the variables as float64
+        inputs = tuple(np.asarray(packed[name], dtype=np.float64).reshape(-1) for name in names)
+        chunk = {name: np.empty((idx.size,) + layout[name][0], dtype=layout[name][1]) 
+                 if (name in outputs or name == 'utot') else None for name in layout}
+        _classify_blocks(inputs, [chunk], [classInfo], thres_u, DISTANCE_CUTOFF, BLOCK_SIZE, n_workers=n_workers)
+        for name, buf in chunk.items():
+            if name in result:
+                result[name][idx] = buf
+        if row_keep is not None:
+            row_keep[idx[~(chunk['utot'] <= thres_u)] // row_len] = True
+
+    for name in names:
+        if name in outputs and name not in result:
+            result[name] = np.full(valid.size, np.nan, dtype=dtype)
+
+    _mask_rows({name: result[name].reshape(work_shape) for name in ['utot', 'type_idx', 'classifiability'] 
+                if name in result}, thres_u, keep=None if row_keep is None else row_keep.reshape(work_shape[:-1]))
+
+    return ({name: result[name].reshape(shape + result[name].shape[1:]) for name in OUTPUTS if name in result}, 
+            recovered)
+
+
+def _classify_rrs_processes(Rrs, band, sensor, version, thres_u, skip_invalid, dtype, n_workers, min_bands=None):
+    # `classify_rrs` on a pool of processes: the valid pixels are classified by the workers and 
+    #   scattered to the raster by the pool, and the row rule is applied here as by `classify`
+    from pyowt.ProcessPool import classify_rrs_processes
+
+    shape = Rrs.shape[:-1]
+    if skip_invalid:
+        valid = ~np.all(np.isnan(Rrs), axis=-1)
+    else:
+        valid = np.ones(shape, dtype=bool)
+
+    if not np.any(valid):
+        # nothing to share with the workers
+        return classify_rrs(Rrs, band, sensor=sensor, version=version, thres_u=thres_u, 
+                            skip_invalid=skip_invalid, dtype=dtype, min_bands=min_bands)
+
+    result = classify_rrs_processes(Rrs, valid, band, sensor=sensor, version=version, thres_u=thres_u,
+                                    dtype=dtype, n_workers=n_workers, min_bands=min_bands)
+    recovered = {} if min_bands is None else {'AVW_recovered': result.pop('AVW_recovered')}
+
+    # (samples, bands) inputs are classified per sample as `OWT` does for (samples, 1) inputs
+    work_shape = shape + (1,) * max(0, 2 - len(shape))
+    _mask_rows({name: result[name].reshape(work_shape) for name in ['utot', 'type_idx', 'classifiability']}, 
+               thres_u)
+
+    return SimpleNamespace(**result, valid=valid, **recovered)
@@ -48,8 +48,8 @@ class PlotOV:
         self.covm_OWT = owt.classInfo.covm_OWT
 
         #   from name and color code
-        self.color_OWT = owt.classInfo.typeColHex
-        self.name_OWT = owt.classInfo.typeName
+        self.color_OWT = list(owt.classInfo.typeColHex)
+        self.name_OWT = list(owt.classInfo.typeName)
 
         # add NaN for unclassified inputs
         #   for those type_idx = -1 and type_str = 'NaN'
@@ -277,8 +277,8 @@ class PlotSpec:
         self.spec_lib = pd.read_csv(self.spec_lib_file)
 
         #   from name and color code
-        self.color_OWT = owt.classInfo.typeColHex
-        self.name_OWT = owt.classInfo.typeName
+        self.color_OWT = list(owt.classInfo.typeColHex)
+        self.name_OWT = list(owt.classInfo.typeName)
 
         # add NaN for unclassified inputs
         #   for those type_idx = -1 and type_str = 'NaN'
@@ -304,11 +304,11 @@ class PlotSpec:
         # get Rrs from ov class
         Rrs = ov.Rrs
         self.band = ov.band
-        self.Rrs = Rrs.reshape(-1, Rrs.shape[2])
-        self.nRrs = self.Rrs / owt.Area
+        self.Rrs = Rrs.reshape(-1, Rrs.shape[-1])
+        self.nRrs = self.Rrs / owt.Area.reshape(-1, 1)
 
         # get membership from owt class
-        self.u = owt.u.reshape(-1, owt.u.shape[2])
+        self.u = owt.u.reshape(-1, owt.u.shape[-1])
 
         ########
         # Plot #
@@ -0,0 +1,157 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from pyowt.OpticalVariables import OpticalVariables, load_sensor_profiles
+from pyowt.OWT import BLOCK_SIZE, DISTANCE_CUTOFF, load_centroids, _classify_blocks
+
+
+# number of spectra per task of a worker
+TASK_SIZE = 4 * BLOCK_SIZE
+
+# values of the outputs of pixels that are not valid (as they'd get anyway)
+FILL_VALUES = {'AVW': np.nan, 'Area': np.nan, 'NDI': np.nan, 'ABC': np.nan, 'u': np.nan, 'utot': np.nan,
+               'type_idx': -1, 'classifiability': 0}
+
+# per-process state of a worker (centroids, settings, and the attached shared arrays),
+#   set once by `_init_worker`
+_WORKER = {}
+
+
+def _create_shared(shape, dtype):
+    # a new shared memory block and an array on it
+    dtype = np.dtype(dtype)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _release(handles, arrays, name):
+    # release the array on a shared block before the block is closed and unlinked
+    del arrays[name]
+    shm = handles.pop(name)
+    shm.close()
+    shm.unlink()
+
+
+def _init_worker(specs, band, sensor, version, dtype, thres_u, min_bands=None):
+    # the centroids and the sensor profiles are read once per process, and the shared arrays are attached
+    _WORKER["classInfo"] = load_centroids(version)
+    load_sensor_profiles()
+
+    _WORKER["handles"] = {name: shared_memory.SharedMemory(name=shm_name)
+                          for name, (shm_name, shape, dtype_) in specs.items()}
+    _WORKER["arrays"] = {name: np.ndarray(shape, dtype=dtype_, buffer=_WORKER["handles"][name].buf)
+                         for name, (shm_name, shape, dtype_) in specs.items()}
+    _WORKER.update(band=band, sensor=sensor, version=version, dtype=dtype, thres_u=thres_u, min_bands=min_bands)
+
+
+def _run_rows(start, stop):
+    # OpticalVariables -> OWT for the spectra [start, stop) of the shared Rrs, into the shared outputs;
+    #   returns `AVW_recovered` of the spectra (0 without `min_bands`)
+    arrays = _WORKER["arrays"]
+    ov = OpticalVariables(Rrs=arrays["Rrs"][start:stop], band=_WORKER["band"], sensor=_WORKER["sensor"],
+                          version=_WORKER["version"], dtype=_WORKER["dtype"], band_axis=-1, 
+                          min_bands=_WORKER["min_bands"])
+
+    inputs = []
+    for name in ["AVW", "Area", "NDI"]:
+        arrays[name][start:stop] = getattr(ov, name)
+        # as `pyowt.classify`, which takes the variables as float64
+        inputs.append(np.asarray(arrays[name][start:stop], dtype=np.float64))
+
+    outputs = {name: arrays[name][start:stop] for name in ["ABC", "u", "utot", "type_idx", "classifiability"]}
+    _classify_blocks(tuple(inputs), [outputs], [_WORKER["classInfo"]], _WORKER["thres_u"], DISTANCE_CUTOFF,
+                     BLOCK_SIZE)
+    return getattr(ov, "AVW_recovered", 0)
+
+
+def classify_rrs_processes(Rrs, valid, band, sensor=None, version='v01', thres_u=0.0001, dtype=None, n_workers=2,
+                           min_bands=None):
+    """Run OpticalVariables -> OWT for the `valid` pixels of Rrs on a pool of processes
+
+    This is the process backend of `pyowt.classify_rrs(..., backend='process')`, for the
+    parts that hold the GIL (e.g., the Python overhead of `OpticalVariables` per block of
+    spectra). The valid spectra are packed into a shared memory block once (by chunks, so
+    without a full-size temporary copy), and the workers read their spectra from it and
+    write their results into shared output arrays, so nothing but the row ranges is pickled.
+    Every worker reads the centroids and the sensor library once, when it is started.
+
+    The results are those of `OpticalVariables` and `classify_into` for the packed spectra,
+    scattered from the shared arrays into the raster outputs (with `FILL_VALUES` for pixels
+    that are not valid), so each output is held only once besides its shared block, which is
+    released as soon as it has been scattered. The row rule of `OWT.update_type_idx` is left
+    to the caller as it runs along the last dim of the raster.
+
+    Args:
+        Rrs (np.ndarray): remote sensing reflectance with wavelength on the last dim
+        valid (np.ndarray): boolean mask of the pixels to process, of shape Rrs.shape[:-1]
+        band (list): wavelengths of Rrs bands
+        sensor (str, optional): sensor name in the band library. None for hyperspectral Rrs.
+        version (str): Version of the classification centroids. Default as 'v01'.
+        thres_u (numeric): the threshold of membership (u) to mask out non-classifiable inputs.
+        dtype (np.dtype, optional): floating type of the calculation and outputs, see `classify_rrs`
+        n_workers (int): number of processes
+        min_bands (int, optional): see `OpticalVariables`. Default as None.
+
+    Returns:
+        dict: AVW, Area, NDI, ABC, u, utot, type_idx, and classifiability of the shape of `valid`
+            (u with an extra last dim for types); with `min_bands`, also `AVW_recovered`, the
+            number of pixels with AVW recovered summed over the workers
+    """
+    index = np.flatnonzero(valid)
+    n, n_band = index.size, Rrs.shape[-1]
+    out_dtype = np.float64 if dtype is None else dtype
+    typeNumb = load_centroids(version).typeNumb
+
+    # the types of AVW, Area, and NDI (and errors of the inputs) from a run on the first spectrum
+    probe = OpticalVariables(Rrs=Rrs[np.unravel_index(index[:1], valid.shape)], band=band, sensor=sensor,
+                             version=version, dtype=dtype, band_axis=-1, min_bands=min_bands)
+
+    layout = {
+        "Rrs": ((n, n_band), Rrs.dtype if dtype is None else dtype),
+        "AVW": ((n,), np.asarray(probe.AVW).dtype),
+        "Area": ((n,), np.asarray(probe.Area).dtype),
+        "NDI": ((n,), np.asarray(probe.NDI).dtype),
+        "ABC": ((n,), out_dtype),
+        "u": ((n, typeNumb), out_dtype),
+        "utot": ((n,), out_dtype),
+        "type_idx": ((n,), np.int8),
+        "classifiability": ((n,), np.int_),
+    }
+
+    handles, arrays = {}, {}
+    try:
+        for name, (shape, dtype_) in layout.items():
+            handles[name], arrays[name] = _create_shared(shape, dtype_)
+
+        for start in range(0, n, TASK_SIZE):
+            stop = min(start + TASK_SIZE, n)
+            arrays["Rrs"][start:stop] = Rrs[np.unravel_index(index[start:stop], valid.shape)]
+
+        specs = {name: (handles[name].name, shape, dtype_) for name, (shape, dtype_) in layout.items()}
+        starts = list(range(0, n, TASK_SIZE))
+        stops = [min(start + TASK_SIZE, n) for start in starts]
+
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(starts)), initializer=_init_worker,
+                                 initargs=(specs, band, sensor, version, dtype, thres_u, min_bands)) as executor:
+            # the counts of recovered AVW are summed, which also raises the first error of the workers (if any)
+            recovered = sum(executor.map(_run_rows, starts, stops))
+
+        # each shared block is released once it is scattered, so that the peak is one output above the rasters
+        _release(handles, arrays, "Rrs")
+        result = {}
+        for name in list(arrays):
+            result[name] = np.full(valid.shape + arrays[name].shape[1:], FILL_VALUES[name], dtype=arrays[name].dtype)
+            result[name][valid] = arrays[name]
+            _release(handles, arrays, name)
+
+        if min_bands is not None:
+            result["AVW_recovered"] = recovered
+        return result
+
+    finally:
+        # the arrays on the buffers are released before the blocks are closed
+        arrays.clear()
+        for shm in handles.values():
+            shm.close()
+            shm.unlink()
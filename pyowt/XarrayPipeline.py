@@ -0,0 +1,195 @@
+import numpy as np
+import xarray as xr
+
+from pyowt.OpticalVariables import band_plan
+from pyowt.OWT import load_centroids
+from pyowt.Pipeline import OUTPUTS, classify_rrs
+
+
+# attributes of the output variables, as written by the satellite handlers
+OUTPUT_ATTRS = {
+    'AVW': {'long_name': 'Apparent Visible Wavelength', 'units': 'nm'},
+    'Area': {'long_name': 'Trapezoidal area of Rrs at RGB bands', 'units': 'sr-1 nm'},
+    'NDI': {'long_name': 'Normalized Difference Index', 'units': '1'},
+    'ABC': {'long_name': 'Box-Cox transformed Area', 'units': '1'},
+    'u': {'long_name': 'Membership of Optical Water Types', 'units': '1'},
+    'utot': {'long_name': 'Total membership of Optical Water Types', 'units': '1'},
+    'type_idx': {'long_name': 'Optical Water Type Index', '_FillValue': -1},
+    'classifiability': {'long_name': 'Classifiability (1 for classifiable, 0 otherwise)'},
+}
+
+
+def _stack_bands(ds, variables, band, wavelength_dim):
+    # Rrs bands of a Dataset (one variable per band) stacked along `wavelength_dim`, lazily for dask,
+    #   with their wavelengths and the names of the band variables
+    if variables is None:
+        variables = [name for name, var in ds.data_vars.items() if 'radiation_wavelength' in var.attrs]
+        if not variables:
+            raise ValueError("No Rrs variables with the attribute 'radiation_wavelength' found in the Dataset, "
+                             "please give `variables` and `band`")
+
+    if band is None:
+        missing = [name for name in variables if 'radiation_wavelength' not in ds[name].attrs]
+        if missing:
+            raise ValueError(f"No attribute 'radiation_wavelength' for {missing}, please give `band`")
+        band = [float(ds[name].attrs['radiation_wavelength']) for name in variables]
+
+    Rrs = ds[list(variables)].to_array(dim=wavelength_dim)
+    return Rrs, band, list(variables)
+
+
+def _grid_mapping(var):
+    # the `grid_mapping` attribute (CF conventions) of a variable, which is moved to the encoding
+    #   when opened with `decode_coords='all'`
+    return var.attrs.get('grid_mapping', var.encoding.get('grid_mapping'))
+
+
+def _grid_mapping_names(grid_mapping):
+    # names of the grid mapping variables in a `grid_mapping` attribute, either 'crs' or of the
+    #   extended form 'crs: x y crs_wgs84: lat lon'
+    if ':' not in grid_mapping:
+        return grid_mapping.split()
+    return [token[:-1] for token in grid_mapping.split() if token.endswith(':')]
+
+
+def _recovered_mask(Rrs, band, sensor, min_bands):
+    # pixels with NaN bands for AVW but at least `min_bands` valid ones, those counted by 
+    #   `OpticalVariables.AVW_recovered` (wavelength on the last dim)
+    Rrs_for_AVW = Rrs[..., band_plan(band, sensor).AVW_index]
+    n_bands = Rrs_for_AVW.shape[-1] - np.count_nonzero(np.isnan(Rrs_for_AVW), axis=-1)
+    return (n_bands < Rrs_for_AVW.shape[-1]) & (n_bands >= min_bands)
+
+
+def _classify_chunk(Rrs, band, sensor, version, thres_u, skip_invalid, dtype, outputs, n_workers, min_bands):
+    # `classify_rrs` on one chunk with wavelength on the last dim (called by `xr.apply_ufunc`), 
+    #   and the mask of recovered AVW with `min_bands`
+    result = classify_rrs(Rrs, band, sensor=sensor, version=version, thres_u=thres_u, skip_invalid=skip_invalid,
+                          dtype=dtype, band_axis=-1, n_workers=n_workers, outputs=list(outputs), min_bands=min_bands)
+    arrays = tuple(getattr(result, name) for name in outputs)
+    if min_bands is not None:
+        arrays += (_recovered_mask(Rrs, band, sensor, min_bands),)
+    return arrays[0] if len(arrays) == 1 else arrays
+
+
+def classify_xarray(obj, band=None, sensor=None, wavelength_dim='wavelength', variables=None, version='v01',
+                    thres_u=0.0001, skip_invalid=True, dtype=None, outputs=('AVW', 'Area', 'NDI', 'type_idx'),
+                    n_workers=None, type_dim='owt', min_bands=None):
+    """Run OpticalVariables -> OWT on xarray data, lazily by chunks if it is backed by dask
+
+    Rrs are taken as a DataArray with a wavelength dim (e.g., (wavelength, lat, lon)), or as a
+    Dataset with one variable per band (e.g., those of the satellite handlers, which have the
+    attribute 'radiation_wavelength'). `classify_rrs` is run on each chunk by `xr.apply_ufunc`,
+    so a dask-backed input is never loaded as a whole; the result is lazy until computed
+    (e.g., by `.compute()` or `.to_netcdf()`). NumPy-backed inputs are classified at once.
+
+    The wavelength dim is taken as a single chunk, and so is the last of the other dims, as the
+    row rule of `OWT.update_type_idx` runs along it: the results are then the same as those of
+    `classify_rrs` on the whole array. The coordinates of the other dims and the attributes of
+    `obj` are kept. So is the georeferencing: the `grid_mapping` attribute (CF conventions) of
+    the Rrs is set on the outputs, and the grid mapping variables of a Dataset (e.g., 'crs') are
+    copied, so that `to_netcdf` writes them.
+
+    Args:
+        obj (xr.DataArray or xr.Dataset): Rrs, see above
+        band (list, optional): wavelengths of Rrs bands. Default as None, that is the coordinates of
+            `wavelength_dim` for a DataArray, or the 'radiation_wavelength' attributes for a Dataset.
+        sensor (str, optional): sensor name in the band library. None for hyperspectral Rrs.
+        wavelength_dim (str): dim of wavelength (the name of the stacked dim for a Dataset).
+            Default as 'wavelength'.
+        variables (list, optional): Rrs variables of a Dataset, in the order of `band`. Default as None
+            for all variables with the attribute 'radiation_wavelength'.
+        version (str): Version of the classification centroids. Default as 'v01'.
+        thres_u (numeric): the threshold of membership (u) to mask out non-classifiable inputs.
+        skip_invalid (bool): only run on valid pixels. Default as True.
+        dtype (np.dtype, optional): floating type of the calculation and outputs, see `classify_rrs`
+        outputs (list): outputs to keep, from 'AVW', 'Area', 'NDI', 'ABC', 'u', 'utot', 'type_idx',
+            and 'classifiability'. Default as ('AVW', 'Area', 'NDI', 'type_idx').
+        n_workers (int, optional): number of threads per chunk, see `classify_rrs`. Default as None.
+        type_dim (str): dim of types for 'u'. Default as 'owt'.
+        min_bands (int, optional): see `classify_rrs`. Default as None.
+
+    Returns:
+        xr.Dataset: the `outputs` on the dims of Rrs other than wavelength (and `type_dim` for 'u'); 
+            with `min_bands`, also `AVW_recovered`, the number of pixels with NaN bands but a valid 
+            AVW as a 0-d variable (summed over the chunks, lazily for dask)
+
+    Examples:
+
+        ds = xr.open_dataset(fn, chunks={'lat': 1000, 'lon': 1000})
+        ds_owt = classify_xarray(ds, sensor='olci-s3a')
+        ds_owt.to_netcdf(fn_out)
+    """
+    outputs = tuple(outputs)
+    unknown = [name for name in outputs if name not in OUTPUTS]
+    if unknown or not outputs:
+        raise ValueError(f"`outputs` should be some of {OUTPUTS}, got {list(outputs)}")
+
+    attrs = dict(getattr(obj, 'attrs', {}))
+    if isinstance(obj, xr.Dataset):
+        Rrs, band, variables = _stack_bands(obj, variables, band, wavelength_dim)
+        # the bands are on the same grid, so the grid mapping of the first one is kept
+        grid_mapping = _grid_mapping(obj[variables[0]])
+    elif isinstance(obj, xr.DataArray):
+        attrs.pop('grid_mapping', None)
+        grid_mapping = _grid_mapping(obj)
+        if wavelength_dim not in obj.dims:
+            raise ValueError(f"The dim '{wavelength_dim}' is not found in {obj.dims}, please set `wavelength_dim`")
+        Rrs = obj
+        if band is None:
+            if wavelength_dim not in obj.coords:
+                raise ValueError(f"No coordinates of '{wavelength_dim}', please give `band`")
+            band = obj[wavelength_dim].values
+    else:
+        raise TypeError("Input 'obj' should be xr.DataArray or xr.Dataset type.")
+
+    band = np.asarray(band)
+    if band.size != Rrs.sizes[wavelength_dim]:
+        raise ValueError(f"{band.size} wavelengths in `band` for {Rrs.sizes[wavelength_dim]} bands of Rrs")
+
+    other_dims = [dim for dim in Rrs.dims if dim != wavelength_dim]
+    if Rrs.chunks is not None:
+        Rrs = Rrs.chunk({dim: -1 for dim in [wavelength_dim] + other_dims[-1:]})
+
+    # the types of the outputs (and errors of the inputs, e.g., an unknown sensor) from one spectrum
+    probe = classify_rrs(np.ones((1, band.size), dtype=Rrs.dtype), band, sensor=sensor, version=version,
+                         thres_u=thres_u, dtype=dtype, outputs=list(outputs), min_bands=min_bands)
+    typeName = load_centroids(version).typeName
+
+    # the mask of recovered AVW is an extra output with `min_bands`
+    n_results = len(outputs) + (min_bands is not None)
+    results = xr.apply_ufunc(
+        _classify_chunk,
+        Rrs,
+        input_core_dims=[[wavelength_dim]],
+        output_core_dims=[[type_dim] if name == 'u' else [] for name in outputs] + [[]] * (n_results - len(outputs)),
+        exclude_dims={wavelength_dim},
+        dask='parallelized',
+        output_dtypes=[getattr(probe, name).dtype for name in outputs] + [bool] * (n_results - len(outputs)),
+        dask_gufunc_kwargs={'output_sizes': {type_dim: len(typeName)}} if 'u' in outputs else None,
+        kwargs={
+            'band': band, 'sensor': sensor, 'version': version, 'thres_u': thres_u,
+            'skip_invalid': skip_invalid, 'dtype': dtype, 'outputs': outputs, 'n_workers': n_workers,
+            'min_bands': min_bands,
+        },
+    )
+    if n_results == 1:
+        results = (results,)
+
+    ds_out = xr.Dataset({name: da for name, da in zip(outputs, results)}, attrs=attrs)
+    if 'u' in outputs:
+        ds_out = ds_out.assign_coords({type_dim: list(typeName)})
+    for name in outputs:
+        ds_out[name].attrs = dict(OUTPUT_ATTRS[name])
+        if grid_mapping is not None:
+            ds_out[name].attrs['grid_mapping'] = grid_mapping
+    if grid_mapping is not None and isinstance(obj, xr.Dataset):
+        # the grid mapping variables (e.g., the CRS), unless kept as coordinates
+        for name in _grid_mapping_names(grid_mapping):
+            if name in obj.data_vars and name not in ds_out.variables:
+                ds_out[name] = obj[name]
+    if min_bands is not None:
+        ds_out['AVW_recovered'] = results[-1].sum()
+        ds_out['AVW_recovered'].attrs = {
+            'long_name': f'Number of pixels with AVW from at least {min_bands} valid bands but some NaN bands'}
+
+    return ds_out
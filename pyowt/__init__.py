@@ -65,8 +65,88 @@ Version history
     - Add new option for OpticalVariables if given Rrs is a 4-d array, say (wavelen, time, lat, lon)
     - Add support for HSI-PRISMA hyperspectral setups as requested by Alice Fabbretto
 
+0.67:
+    - OWT centroids (and inverted covariance matrices) are loaded once per process by `pyowt.OWT.load_centroids`
+      and shared read-only by all `OWT` instances
+    - Mahalanobis distances of all types are computed by one blocked kernel, `pyowt.OWT.mahalanobis_distance`,
+      without the stacked feature cube; see `projects/benchmarks/benchmark_mahalanobis.py`
+    - Memberships use the closed-form chi-square survival function for df = 3 (`pyowt.OWT.membership_from_distance`)
+      instead of `scipy.stats.chi2`
+    - Memberships of distances above `pyowt.OWT.DISTANCE_CUTOFF` (~32.09) are set to 0 without evaluation
+    - `OWT.type_idx` is now int8 and `OWT.type_str` is mapped by a lookup table on first access
+    - New `pyowt.OWT.classify_into` runs the classification block by block into caller-provided output buffers
+      (for tile-by-tile processing with constant memory); `OWT` is a wrapper over it
+    - New `skip_invalid` option for `OpticalVariables` and `OWT` to only process valid (non-NaN) pixels;
+      satellite_handlers use it
+    - New `pyowt.Pipeline.classify_rrs` runs OpticalVariables -> OWT on the packed valid pixels only
+    - New `top_k` option for `OWT` to keep only the k dominant types and their memberships (`type_topk`, `u_topk`)
+      instead of the full membership cube; `run_AquaINFRA.py` has a new output_option 3 for satellite data
+    - New `dtype` option for `OpticalVariables`, `OWT`, and `classify_rrs` to run in float32;
+      see `projects/benchmarks/check_float32_regression.py`
+    - New `pyowt.OWT.classify_versions` classifies with several centroid versions in one pass, sharing the
+      features and computing the distances to all centroid sets by a single matrix product per block
+    - New `OWT.reclassify(thres_u)` updates type_idx and classifiability from the kept memberships, and
+      `OWT.sweep_thres_u(thresholds)` counts classifiable pixels per type for many thresholds at once
+    - `OWT` accepts AVW, Area, and NDI with any number of dims; new `band_axis` option for `OpticalVariables`
+      and `classify_rrs` to take Rrs of any shape (e.g., (wavelen, time, lat, lon)) by views, with
+      outputs in the caller's shape
+    - New stateless functions `pyowt.classify` (AVW, Area, NDI) and `pyowt.classify_rrs` (Rrs) with little
+      overhead for a few spectra; see `projects/benchmarks/benchmark_latency.py`
+    - New `pyowt.LookupGrid.LookupGrid` for classification by trilinear interpolation of precomputed memberships
+      with an error bound per cell (pixels above `tol` are classified exactly), cached on disk per version and
+      resolution (`PYOWT_CACHE_DIR`, default ~/.cache/pyowt); it isn't faster than `pyowt.classify` on one CPU,
+      see `projects/benchmarks/benchmark_lookup_grid.py` for its error and speed
+    - New `dedup` option for `OWT` and `classify_into` to classify only the unique (optionally rounded by
+      `dedup_decimals`) triples of AVW, Area, and NDI; the compression ratio is reported in `meta`
+    - New `n_workers` option for `OWT`, `classify_into`, `classify_rrs`, and `LakeCCIProcessor` to run blocks
+      of pixels on a thread pool, with results identical to one thread; see `projects/benchmarks/benchmark_threads.py`
+    - New `backend='process'` option for `classify_rrs` to run on a pool of processes with Rrs and the outputs
+      in shared memory (`pyowt.ProcessPool`), for the parts of `OpticalVariables` that hold the GIL
+    - New `max_memory` option for `classify_rrs` to run `OpticalVariables` on chunks of spectra sized by
+      `pyowt.estimate_memory` (a dry run of the memory per pixel and spectrum), so that the peak stays below
+      the budget; see `projects/benchmarks/check_memory_budget.py`
+    - New `outputs` option for `classify_rrs` and `classify_into` to keep only the selected outputs (e.g.,
+      `['type_idx']`); the others are never allocated for the whole raster, and the row rule of
+      `OWT.update_type_idx` is applied by flags per row when utot is not kept (also for `classify_versions`)
+    - New `pyowt.OpticalVariables.load_sensor_profiles` compiles the band library and the AVW regression
+      coefficients once per process into read-only `SensorProfile` records (AVW and RGB bands, band range,
+      and coefficients), which `OpticalVariables` looks up by `sensor_profile(sensor)` without touching the disk
+    - New `pyowt.OpticalVariables.band_plan` resolves the bands of AVW, Area, and NDI once per band layout and
+      sensor (`BandPlan`); `OpticalVariables` takes Rrs by slices (views) where the bands are evenly spaced
+    - AVW of hyperspectral Rrs not at 1 nm is computed by two weights per band (the linear interpolation to 1 nm
+      folded into the numerator and denominator), without `interp1d` and the interpolated 401-band Rrs
+    - New `pyowt.XarrayPipeline.classify_xarray` (also `pyowt.classify_xarray`) runs `classify_rrs` on an xarray
+      DataArray (with a wavelength dim) or Dataset (one variable per band) by `xr.apply_ufunc`, lazily by dask
+      chunks, keeping the coordinates and attributes
+    - New `pyowt.Pipeline.iter_classify_rrs` (also `pyowt.iter_classify_rrs`) classifies an iterable of Rrs batches
+      with the same bands and yields the results per batch, so the memory depends on the batch size only
+    - New `min_bands` option for `OpticalVariables`, `classify_rrs`, `iter_classify_rrs`, and `classify_xarray` to
+      calculate AVW from the non-NaN bands of each pixel (if at least `min_bands` are valid) instead of NaN for
+      a single NaN band; `OpticalVariables` keeps the bands used per pixel (`AVW_n_bands`), and all of them
+      report the number of recovered pixels (`AVW_recovered`); a warning is given for multispectral sensors
+
 '''
 
 __package__ = "pyOWT"
-__version__ = "0.66"
+__version__ = "0.67"
+
+
+def __getattr__(name):
+    # functional API, imported on first access so that `import pyowt` (e.g., by setup.py) stays light
+    if name == "classify":
+        from pyowt.OWT import classify
+        return classify
+    if name == "classify_rrs":
+        from pyowt.Pipeline import classify_rrs
+        return classify_rrs
+    if name == "estimate_memory":
+        from pyowt.Pipeline import estimate_memory
+        return estimate_memory
+    if name == "iter_classify_rrs":
+        from pyowt.Pipeline import iter_classify_rrs
+        return iter_classify_rrs
+    if name == "classify_xarray":
+        from pyowt.XarrayPipeline import classify_xarray
+        return classify_xarray
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
@@ -60,8 +60,8 @@ class cmems_products():
         self.classification()
 
     def classification(self):       
-        ov = OpticalVariables(Rrs=self.Rrs, band=self.wavelen, sensor=self.sensor)
-        owt = OWT(ov.AVW, ov.Area, ov.NDI)
+        ov = OpticalVariables(Rrs=self.Rrs, band=self.wavelen, sensor=self.sensor, skip_invalid=True)
+        owt = OWT(ov.AVW, ov.Area, ov.NDI, skip_invalid=True)
         self.ds_Rrs['type_idx'] = (('lat', 'lon'), owt.type_idx.astype(np.int32))
         self.ds_Rrs['type_idx'].attrs['description'] = 'Type index classification'
         self.ds_Rrs.to_netcdf(self.filename_output)
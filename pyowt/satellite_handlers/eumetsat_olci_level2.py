@@ -16,12 +16,13 @@ except ImportError:
 
 class eumetsat_olci_level2:
 
-    def __init__(self, filename, sensor='OLCI_S3A', save_path=None, save=True):
+    def __init__(self, filename, sensor='OLCI_S3A', save_path=None, save=True, top_k=None):
         if not lxml_installed:
             raise ImportError("The 'lxml' package is required but not installed. Please install it using 'pip install lxml'.")
         
         self.filename = filename
         self.sensor = sensor
+        self.top_k = top_k # only keep memberships of the k dominant types, see `OWT`
 
         if save_path is None:
             self.save_path = os.path.dirname(self.filename)
@@ -131,8 +132,8 @@ class eumetsat_olci_level2:
         self.ds_new = ds_new
     
     def classification(self):
-        ov = OpticalVariables(Rrs=self.Rrs_vars, band=self.wavelengths, sensor=self.sensor)
-        owt = OWT(ov.AVW, ov.Area, ov.NDI)
+        ov = OpticalVariables(Rrs=self.Rrs_vars, band=self.wavelengths, sensor=self.sensor, skip_invalid=True)
+        owt = OWT(ov.AVW, ov.Area, ov.NDI, skip_invalid=True, top_k=self.top_k)
         self.ov = ov
         self.owt = owt
     
@@ -6,11 +6,13 @@ import dask
 
 from pyowt.OpticalVariables import OpticalVariables
 from pyowt.OWT import OWT
+from pyowt.Pipeline import classify_rrs
 
-def owt_classification_on_chunk(rrs_chunk, band_wavelengths, sensor_name):
+def owt_classification_on_chunk(rrs_chunk, band_wavelengths, sensor_name, n_workers=None):
     """
     A wrapper function to run the complete OWT classification process on a data chunk.
     This function is called by xarray.apply_ufunc for each chunk.
+    With `n_workers`, the chunk is processed by `classify_rrs` on a pool of threads.
     """
     if np.all(np.isnan(rrs_chunk)):
         nan_shape = rrs_chunk.shape[:-1]  # Get lat, lon shape
@@ -19,11 +21,16 @@ def owt_classification_on_chunk(rrs_chunk, band_wavelengths, sensor_name):
                 np.full(nan_shape, np.nan, dtype=np.float32),
                 np.full(nan_shape, -1, dtype=np.int32))
 
-    # Calculate optical variables from the Rrs chunk.
-    ov = OpticalVariables(Rrs=rrs_chunk, band=band_wavelengths, sensor=sensor_name)
-    
-    # Perform the OWT classification.
-    owt = OWT(ov.AVW, ov.Area, ov.NDI)
+    if n_workers is not None:
+        # the whole chain on blocks of spectra in parallel, with the same results
+        owt = classify_rrs(rrs_chunk, band=band_wavelengths, sensor=sensor_name, skip_invalid=True,
+                           n_workers=n_workers)
+    else:
+        # Calculate optical variables from the Rrs chunk.
+        ov = OpticalVariables(Rrs=rrs_chunk, band=band_wavelengths, sensor=sensor_name, skip_invalid=True)
+
+        # Perform the OWT classification.
+        owt = OWT(ov.AVW, ov.Area, ov.NDI, skip_invalid=True)
     
     # Clip the optical variable values to their valid ranges.
     avw_clipped = np.where((owt.AVW >= 400) & (owt.AVW <= 800), owt.AVW, np.nan)
@@ -47,6 +54,7 @@ class LakeCCIProcessor:
         chunk_sizes={"lat": 1000, "lon": 1000},
         keep_rrs_bands=True,
         verbose=True,
+        n_workers=None,
     ):
         """
         Initializes and runs the processing workflow.
@@ -56,6 +64,9 @@ class LakeCCIProcessor:
             chunk_sizes (dict): A dictionary specifying the chunk sizes for Dask.
             keep_rrs_bands (bool): If True, the output file will include the Rrs bands. 
                                    If False (default), only classification results are saved.
+            n_workers (int, optional): number of threads per chunk (-1 for all CPUs). Chunks are 
+                                   computed one after another (the synchronous scheduler, for the 
+                                   netCDF writing), so this is where the cores are used. Default as None.
         """
         if not os.path.exists(filename):
             print(f"Error: Input file not found at '{filename}'.")
@@ -71,6 +82,7 @@ class LakeCCIProcessor:
         self.chunk_sizes = chunk_sizes
         self.keep_rrs_bands = keep_rrs_bands
         self.verbose = verbose
+        self.n_workers = n_workers
 
         self.sensor = 'LakeCCI-MERIS'
         self.predefined_bands = {'LakeCCI-MERIS': [413, 443, 490, 510, 560, 620, 665, 681, 709, 754, 779, 885]}
@@ -127,6 +139,7 @@ class LakeCCIProcessor:
                 kwargs={
                     "band_wavelengths": final_wavelengths,
                     "sensor_name": self.sensor,
+                    "n_workers": self.n_workers,
                 },
             )
 